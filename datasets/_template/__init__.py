@@ -23,8 +23,8 @@ def cldf(dataset, concepticon, **kw):
 
     .. notes::
 
-        There's also a dict `dataset.glottolog_languoids` mapping Glottocodes to \
-        Glottolog languoid objects.
+        There's also a `pylexibank.glottolog.GlottologIndex` `dataset.glottolog` \
+        providing ISO codes, names, macroareas and lineages of Glottolog languoids.
     """
     with CldfDataset(REQUIRED_FIELDS, dataset) as ds:
         pass
@@ -25,24 +25,20 @@ def cldf(dataset, concepticon, **kw):
 
     l_map = {int(l['ID']): l['GLOTTOCODE'] for l in dataset.languages if l['GLOTTOCODE']}
     gl_map = dataset.glottocode_by_iso
-    wordlists = []
-    for xml in tqdm(list(dataset.raw.glob('*.xml')), desc='xml-to-wordlist', leave=False):
-        wl = abvd.Wordlist(dataset, xml, SECTION)
-        if int(wl.language.id) in l_map:
-            wl.language.glottocode = l_map[int(wl.language.id)]
-        elif wl.language.iso:
-            if wl.language.iso in gl_map:
-                wl.language.glottocode = gl_map[wl.language.iso]
-        wordlists.append(wl)
 
     source_map = defaultdict(lambda: (None, None))
     for wlid, (author, notes) in MAP.items():
         source_map[wlid.split('-', 1)[1]] = (slug(author), notes.strip())
 
     unmapped = Unmapped(lambda r: int(r[0]))
-    for wl in tqdm(wordlists, desc='wordlist-to-cldf', leave=False):
-        ds = wl.to_cldf(concept_map, unmapped, *source_map[wl.id])
-        cognates = list(wl.cognates())
-        #dataset.cognates.extend(iter_alignments(ds, cognates, column='Value', method='progressive'))
-        dataset.cognates.extend(cognates)
+    # Wordlists are converted one at a time, so only one is kept in memory:
+    for xml in tqdm(list(dataset.raw.glob('*.xml')), desc='xml-to-cldf', leave=False):
+        wl = abvd.Wordlist(dataset, xml, SECTION)
+        if int(wl.language.id) in l_map:
+            wl.language.glottocode = l_map[int(wl.language.id)]
+        elif wl.language.iso:
+            if wl.language.iso in gl_map:
+                wl.language.glottocode = gl_map[wl.language.iso]
+        wl.to_cldf(
+            concept_map, unmapped, *source_map[wl.id], cognates=dataset.cognates)
     unmapped.pprint()
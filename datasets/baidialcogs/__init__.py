@@ -27,4 +27,5 @@ def cldf(dataset, concepticon, **kw):
         alm = lp.Alignments(dataset.raw.joinpath('BDS-cognates.tsv').as_posix())
 
         cognates = wordlist2cognates(alm, cldfds, 'List2016i')
-        dataset.cognates.extend(iter_alignments(alm, cognates))
+        dataset.cognates.extend(iter_alignments(
+            alm, cognates, processes=kw.get('jobs') or 1))
@@ -20,7 +20,8 @@ def cldf(dataset, concepticon, **kw):
         concept_map[c['ID']] = c['CONCEPTICON_ID'] or None
 
     gl_map = dataset.glottocode_by_iso
-    wordlists = []
+    sources = {}
+    unmapped = Unmapped(lambda r: int(r[0]))
     for xml in dataset.raw.glob('*.xml'):
         wl = abvd.Wordlist(dataset, xml, SECTION)
         if wl.language.iso:
@@ -30,11 +31,6 @@ def cldf(dataset, concepticon, **kw):
             dataset.log.warn(
                 'no glottocode for language %s, iso-code %s' % (
                     wl.language.name, wl.language.iso))
-        wordlists.append(wl)
-
-    sources = {}
-    unmapped = Unmapped(lambda r: int(r[0]))
-    for wl in wordlists:
         args = [None, None]
         ref = get_reference(None, None, wl.language.notes, None, sources)
         if ref:
@@ -127,4 +127,5 @@ def cldf(dataset, concepticon, **kw):
                         '',
                     ])
         segmentize(ds, clean=lambda s: s.split(' ~ ')[0])
-    dataset.cognates.extend(iter_alignments(ds, cognatesets, column='Segments'))
+    dataset.cognates.extend(iter_alignments(
+        ds, cognatesets, column='Segments', processes=kw.get('jobs') or 1))
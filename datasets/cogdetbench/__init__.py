@@ -108,6 +108,8 @@ def cldf(dataset, concepticon, **kw):
                 ])
 
             dataset.cognates.extend(
-                iter_alignments(lp.Alignments(wl), cognates, method='library'))
+                iter_alignments(
+                    lp.Alignments(wl), cognates, method='library',
+                    processes=kw.get('jobs') or 1))
             for er in sorted(set(errors)):
                 print(er, dset)
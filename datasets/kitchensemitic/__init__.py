@@ -153,4 +153,5 @@ def cldf(dataset, concepticon, **kw):
                 'Kitchen2012', 
                 '', '', '']]
 
-        dataset.cognates.extend(iter_alignments(lp.Alignments(wl), cognates))
+        dataset.cognates.extend(iter_alignments(
+            lp.Alignments(wl), cognates, processes=kw.get('jobs') or 1))
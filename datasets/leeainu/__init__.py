@@ -131,4 +131,5 @@ def cldf(dataset, concepticon, **kw):
                             '',
                             '',
                         ])
-        dataset.cognates.extend(iter_alignments(ds, cognates, column='Segments'))
+        dataset.cognates.extend(iter_alignments(
+            ds, cognates, column='Segments', processes=kw.get('jobs') or 1))
@@ -100,4 +100,5 @@ def cldf(dataset, concepticon, **kw):
                             '',
                         ])
         segmentize(ds)
-    dataset.cognates.extend(iter_alignments(ds, cognatesets, column='Segments'))
+    dataset.cognates.extend(iter_alignments(
+        ds, cognatesets, column='Segments', processes=kw.get('jobs') or 1))
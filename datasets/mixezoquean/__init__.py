@@ -92,5 +92,5 @@ def cldf(dataset, concepticon, **kw):
                         cognates += [[idx, ds.name,
                             word, cogid, '', 'expert', PROVIDER, '', '', '']]
                         idx += 1
-    dataset.cognates.extend(iter_alignments(ds, cognates,
-        method='progressive', ))
+    dataset.cognates.extend(iter_alignments(
+        ds, cognates, method='progressive', processes=kw.get('jobs') or 1))
@@ -109,4 +109,5 @@ def cldf(dataset, concepticon, **kw):
                         '',
                         ''])
                     idx += 1
-    dataset.cognates.extend(iter_alignments(ds, cognates, method='progressive', ))
+    dataset.cognates.extend(iter_alignments(
+        ds, cognates, method='progressive', processes=kw.get('jobs') or 1))
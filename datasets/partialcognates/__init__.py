@@ -76,4 +76,5 @@ def cldf(dataset, concepticon, **kw):
                 ]]
 
             dataset.cognates.extend(iter_alignments(wl, cognates,
-                method='progressive', prefix=srckey + '-'))
+                method='progressive', prefix=srckey + '-',
+                processes=kw.get('jobs') or 1))
@@ -114,6 +114,7 @@ def cldf(dataset, concepticon, **kw):
         wl = lp.Wordlist(D)
         wl.renumber('cog')
         alm = lp.Alignments(wl)
-        dataset.cognates.extend(iter_alignments(alm, wordlist2cognates(wl, ds, SOURCE)))
+        dataset.cognates.extend(iter_alignments(
+            alm, wordlist2cognates(wl, ds, SOURCE), processes=kw.get('jobs') or 1))
 
     unmapped.pprint()
@@ -16,7 +16,7 @@ def download(dataset):
 
 def cldf(dataset, concepticon, **kw):
     data = get_all(dataset)
-    gl_map = {k: v.id for k, v in dataset.glottolog_languoids.items()}
+    gl_map = {gc: gc for gc in dataset.glottolog}
     gl_map.update(dataset.glottocode_by_iso)
 
     swadesh_concepts = {
@@ -7,16 +7,17 @@ from pylexibank.dataset import Unmapped
 SECTION = 'utoaztecan'
 
 
-def download(dataset):
+def download(dataset, **kw):
     abvd.download(dataset, SECTION)
 
 
 def cldf(dataset, concepticon, **kw):
     gl_map = dataset.glottocode_by_iso
     l_map = {l['NAME']: l['GLOTTOCODE'] or None for l in dataset.languages}
+    concept_map = {cs.gloss.lower(): cs.id for cs in concepticon.conceptsets.values()}
+    concept_map.update({c['GLOSS']: c['CONCEPTICON_ID'] or None for c in dataset.concepts})
 
     unmapped = Unmapped(lambda r: int(r[0]))
-    wordlists = []
     for xml in dataset.raw.glob('*.xml'):
         wl = abvd.Wordlist(dataset, xml, SECTION)
         if wl.language.name in l_map:
@@ -26,15 +27,9 @@ def cldf(dataset, concepticon, **kw):
                 wl.language.glottocode = gl_map[wl.language.iso]
         if not wl.language.glottocode:
             unmapped.languages.add((wl.language.id, wl.language.name, wl.language.iso))
-        wordlists.append(wl)
-
-    concept_map = {cs.gloss.lower(): cs.id for cs in concepticon.conceptsets.values()}
-    concept_map.update({c['GLOSS']: c['CONCEPTICON_ID'] or None for c in dataset.concepts})
-
-    for wl in wordlists:
         wl.to_cldf(
             concept_map,
             unmapped,
-            concept_key=lambda entry: entry.word.split('/')[0])
-        dataset.cognates.extend(list(wl.cognates()))
+            concept_key=lambda entry: entry.word.split('/')[0],
+            cognates=dataset.cognates)
     unmapped.pprint()
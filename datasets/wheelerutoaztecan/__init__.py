@@ -80,6 +80,7 @@ def cldf(dataset, concepticon, **kw):
 
         # two methods for alignments: progressive or library
         dataset.cognates.extend(iter_alignments(
-            ds, cognates, column='Segments', method='progressive'))
+            ds, cognates, column='Segments', method='progressive',
+            processes=kw.get('jobs') or 1))
 
     dataset.write_cognates()
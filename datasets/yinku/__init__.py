@@ -151,5 +151,5 @@ def cldf(dataset, concepticon, **kw):
             SOURCE,
             '', '', ''] for k in alms]
 
-        dataset.cognates.extend(iter_alignments(alms, cognates,
-            method='library'))
+        dataset.cognates.extend(iter_alignments(
+            alms, cognates, method='library', processes=kw.get('jobs') or 1))
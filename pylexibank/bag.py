@@ -0,0 +1,130 @@
+# coding: utf8
+"""
+Validation of the raw data of a dataset, which is stored as bagit bag.
+
+Since `bagit.Bag.is_valid` re-computes the checksums of all files in the bag, validating
+datasets with many raw files is expensive. Thus, we store size, modification time and
+inode together with the checksums computed for each payload file in a sidecar file in the
+lexibank cache directory, and only re-compute checksums for files whose stat changed. Tag
+files - i.e. the manifests and bag metadata listed in the tag manifests - are small, so
+their checksums are always re-computed.
+"""
+from __future__ import unicode_literals, print_function, division
+import os
+import hashlib
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import bagit
+from clldutils import jsonlib
+
+from pylexibank import cache
+
+HASH_BLOCK_SIZE = 512 * 1024
+
+
+def processes():
+    """
+    :return: Number of processes to use for computing checksums.
+    """
+    # Daemonic processes - e.g. the workers of `cli.with_dataset` - cannot have children.
+    if multiprocessing.current_process().daemon:
+        return 1
+    return multiprocessing.cpu_count()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [
+        st.st_size,
+        getattr(st, 'st_mtime_ns', int(st.st_mtime * 1e9)),
+        st.st_ino]
+
+
+def _hash(args):
+    path, algorithms = args
+    hashers = [(alg, hashlib.new(alg)) for alg in algorithms]
+    try:
+        stat = _stat(path)
+        with open(path, 'rb') as fp:
+            for block in iter(lambda: fp.read(HASH_BLOCK_SIZE), b''):
+                for _, hasher in hashers:
+                    hasher.update(block)
+    except (OSError, IOError):
+        return None, {}
+    return stat, {alg: hasher.hexdigest() for alg, hasher in hashers}
+
+
+def sidecar(bag):
+    return cache.DIR.joinpath(
+        'bagit', hashlib.md5(bag.path.encode('utf8')).hexdigest() + '.json')
+
+
+def is_valid(bag, paranoid=False, threads=None):
+    """
+    Validate a bag, only re-computing checksums of tag files and of payload files whose
+    stat changed.
+
+    :param bag: `bagit.Bag` instance.
+    :param paranoid: Flag signaling whether to re-compute all checksums.
+    :param threads: Number of threads to use for computing checksums.
+    :return: `bool`
+    """
+    if paranoid:
+        try:
+            bag.validate(processes=processes())
+        except bagit.BagError:
+            return False
+        return True
+
+    try:
+        # Check structure, Payload-Oxum and whether files and manifests match:
+        bag.validate(completeness_only=True)
+    except bagit.BagError:
+        return False
+
+    fname = sidecar(bag)
+    stats = jsonlib.load(fname) if fname.exists() else {}
+    valid, todo = {}, []
+    payload = bag.payload_entries()
+    for rel_path, hashes in bag.entries.items():
+        path = os.path.join(bag.path, bag.normalized_filesystem_names.get(rel_path, rel_path))
+        hashes = {alg: h.lower() for alg, h in hashes.items()}
+        cached = stats.get(rel_path)
+        try:
+            stat = _stat(path)
+        except OSError:
+            return False
+        if rel_path in payload and cached and cached[0] == stat and \
+                all(cached[1].get(alg) == h for alg, h in hashes.items()):
+            valid[rel_path] = cached
+        else:
+            todo.append((rel_path, path, hashes))
+
+    res = True
+    if todo:
+        pool = ThreadPool(threads or multiprocessing.cpu_count())
+        try:
+            computed = pool.map(_hash, [(path, sorted(hashes)) for _, path, hashes in todo])
+        finally:
+            pool.close()
+            pool.join()
+        for (rel_path, _, hashes), (stat, digests) in zip(todo, computed):
+            if stat and digests == hashes:
+                if rel_path in payload:
+                    valid[rel_path] = [stat, digests]
+            else:
+                res = False
+
+    if valid != stats:
+        if not fname.parent.exists():
+            fname.parent.mkdir(parents=True)
+        jsonlib.dump(valid, fname)
+    return res
+
+
+def update_checksums(bag):
+    """
+    Recompute the manifests of a bag.
+    """
+    bag.save(processes=processes(), manifests=True)
@@ -0,0 +1,168 @@
+# coding: utf8
+"""
+A catalog of summary statistics of the CLDF data of all lexibank datasets.
+
+Summary commands like `lexibank ls` or `lexibank readme` would otherwise have to read the
+CLDF metadata - or even the CSV files - of all datasets. So the catalog is updated whenever
+a CLDF dataset is written and stored as SQLite database `catalog.sqlite` in the datasets
+directory. A dataset's entries are stale if the modification time of its `metadata.json`
+or of any of its CLDF metadata files changed; stale entries are recomputed from the CLDF
+data on disk.
+"""
+from __future__ import unicode_literals, print_function, division
+import json
+import sqlite3
+from collections import OrderedDict
+
+from clldutils.path import Path
+
+from pylexibank.dataset import Metadata, CldfDatasetBase, synonymy_index
+
+FNAME = 'catalog.sqlite'
+# Summary statistics of a CLDF dataset with their SQL types; lists are stored as JSON:
+SUMMARY = OrderedDict([
+    ('lexeme_count', 'INTEGER'),
+    ('language_count', 'INTEGER'),
+    ('concept_count', 'INTEGER'),
+    ('languages', 'TEXT'),
+    ('concepts', 'TEXT'),
+    ('synonymy_index', 'REAL'),
+    ('glottolog_count', 'INTEGER'),
+    ('concepticon_count', 'INTEGER'),
+    ('source_count', 'INTEGER'),
+    ('macroareas', 'TEXT'),
+    ('glottolog_version', 'TEXT'),
+    ('concepticon_version', 'TEXT'),
+])
+JSON_COLUMNS = ['languages', 'concepts', 'macroareas']
+
+
+def summary(cldfds, notes):
+    """
+    :param cldfds: CLDF dataset.
+    :param notes: `dict` mapping titles of the notes of the CLDF values table to their \
+    properties, see `pylexibank.dataset.Metadata.notes`.
+    :return: `dict` of summary statistics of a CLDF dataset.
+    """
+    rows = cldfds.rows
+    sindex, langs = synonymy_index(cldfds)
+    concepts = set(row['Parameter_ID'] for row in rows)
+    return dict(
+        lexeme_count=len(rows),
+        language_count=len(langs),
+        concept_count=len(concepts),
+        languages=sorted(langs),
+        concepts=sorted(concepts, key=lambda c: c or ''),
+        synonymy_index=sindex / float(len(langs)) if langs else 0,
+        glottolog_count=len([row for row in rows if row.get('Language_ID')]),
+        concepticon_count=len([row for row in rows if row.get('Parameter_ID')]),
+        source_count=len([row for row in rows if row.get('Source')]),
+        macroareas=sorted(notes.get('stats', {}).get('macroareas', [])),
+        glottolog_version=notes.get('environment', {}).get('glottolog_version'),
+        concepticon_version=notes.get('environment', {}).get('concepticon_version'))
+
+
+def _mtime(path):
+    return path.stat().st_mtime
+
+
+class Catalog(object):
+    def __init__(self, path):
+        self.path = Path(path)
+        self._db = None
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        """
+        :return: The catalog of the datasets directory containing `dataset`.
+        """
+        return cls(dataset.dir.parent.joinpath(FNAME))
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path.as_posix(), timeout=60)
+            with self._db:
+                self._db.execute("""\
+CREATE TABLE IF NOT EXISTS dataset (
+    id TEXT PRIMARY KEY, mtime REAL, title TEXT, license TEXT)""")
+                self._db.execute("""\
+CREATE TABLE IF NOT EXISTS cldf (
+    dataset TEXT, fname TEXT, mtime REAL, name TEXT, %s,
+    PRIMARY KEY (dataset, fname))""" % ', '.join('%s %s' % item for item in SUMMARY.items()))
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _update_dataset(self, dataset):
+        self.db.execute(
+            'INSERT OR REPLACE INTO dataset (id, mtime, title, license) VALUES (?, ?, ?, ?)',
+            (dataset.id,
+             _mtime(dataset.dir.joinpath('metadata.json')),
+             dataset.md.get('dc:title'),
+             dataset.md.get('dc:license')))
+
+    def _update_cldf(self, dataset, md_path, name, values):
+        cols = ['dataset', 'fname', 'mtime', 'name'] + list(SUMMARY)
+        values = dict(
+            values, dataset=dataset.id, fname=md_path.name, mtime=_mtime(md_path), name=name)
+        self.db.execute(
+            'INSERT OR REPLACE INTO cldf (%s) VALUES (%s)' % (
+                ', '.join(cols), ', '.join('?' for _ in cols)),
+            [json.dumps(values[col]) if col in JSON_COLUMNS else values[col]
+             for col in cols])
+
+    def update(self, dataset, md_path, name, values):
+        """
+        Update the catalog entry for a CLDF dataset which has just been written.
+
+        :param dataset: `pylexibank.dataset.DatasetInfo` instance.
+        :param md_path: Path of the CLDF metadata file.
+        :param name: Name of the CLDF dataset.
+        :param values: `dict` of summary statistics as returned by `summary`.
+        """
+        with self.db:
+            self._update_dataset(dataset)
+            self._update_cldf(dataset, md_path, name, values)
+
+    def is_stale(self, dataset):
+        row = self.db.execute(
+            'SELECT mtime FROM dataset WHERE id = ?', (dataset.id,)).fetchone()
+        if row is None or row[0] != _mtime(dataset.dir.joinpath('metadata.json')):
+            return True
+        return dict(self.db.execute(
+            'SELECT fname, mtime FROM cldf WHERE dataset = ?', (dataset.id,))) != {
+            p.name: _mtime(p) for p in dataset.iter_cldf_metadata_paths()}
+
+    def refresh(self, dataset):
+        """
+        Recompute the catalog entries of a dataset from its CLDF data.
+        """
+        with self.db:
+            self.db.execute('DELETE FROM cldf WHERE dataset = ?', (dataset.id,))
+            self._update_dataset(dataset)
+            for p in dataset.iter_cldf_metadata_paths():
+                cldfds = CldfDatasetBase.from_metadata(p)
+                self._update_cldf(
+                    dataset, p, cldfds.name, summary(cldfds, Metadata.from_file(p).notes))
+
+    def __getitem__(self, dataset):
+        """
+        :param dataset: `pylexibank.dataset.DatasetInfo` instance.
+        :return: `list` of `dict`s with name and summary statistics of the CLDF datasets \
+        of `dataset`, refreshing stale entries.
+        """
+        if self.is_stale(dataset):
+            self.refresh(dataset)
+        cols = ['name'] + list(SUMMARY)
+        res = []
+        for row in self.db.execute(
+                'SELECT %s FROM cldf WHERE dataset = ? ORDER BY fname' % ', '.join(cols),
+                (dataset.id,)):
+            res.append({
+                col: json.loads(v) if col in JSON_COLUMNS else v
+                for col, v in zip(cols, row)})
+        return res
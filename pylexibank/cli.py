@@ -14,6 +14,7 @@ The basic invocation looks like
 from __future__ import unicode_literals, division, print_function
 import os
 import sys
+import traceback
 from time import time
 from textwrap import wrap
 from collections import defaultdict, Counter
@@ -24,12 +25,16 @@ from clldutils.dsv import UnicodeWriter
 from clldutils import jsonlib
 from clldutils import licenses
 from clldutils.markup import Table
-from pyglottolog.api import Glottolog
 
 import pylexibank
+from pylexibank import memo, util, lexemes, wordlength
 from pylexibank.util import data_path
-from pylexibank.cache import load, dump
-from pylexibank.dataset import Dataset, synonymy_index, TranscriptionReport
+from pylexibank.context import RunContext
+from pylexibank.catalog import Catalog, FNAME
+from pylexibank.coverage import CoverageMatrix, PARTIAL_COVERAGE, cache_key, csv_sources
+from pylexibank.dataset import (
+    Dataset, DatasetInfo, TranscriptionReport, JSON_FORMATS,
+)
 
 
 HOME = Path(os.path.expanduser('~'))
@@ -54,14 +59,26 @@ def is_dataset_dir(d):
         and d.name != '_template' and d.joinpath('metadata.json').exists()
 
 
-def get_dataset(args, name=None):
+def get_dataset(args, name=None, cls=Dataset):
+    """
+    :param cls: `Dataset` or - if only metadata is needed - `DatasetInfo`.
+    """
     name = name or args.args[0]
     dir_ = Path(name)
     if not is_dataset_dir(dir_):
         dir_ = data_path(name, repos=args.lexibank_repos)
         if not is_dataset_dir(dir_):
             raise ParserError('invalid dataset spec')
-    return Dataset(dir_)
+    return cls(dir_)
+
+
+def iter_datasets(args):
+    """
+    :return: Generator of `DatasetInfo` objects for all datasets, ordered by ID.
+    """
+    for d in sorted(data_path(repos=args.lexibank_repos).iterdir(), key=lambda d: d.name):
+        if is_dataset_dir(d):
+            yield DatasetInfo(d)
 
 
 def download(args):
@@ -95,87 +112,212 @@ def ls(args):
     if args.args:
         tl = 25
         table.columns.extend(col.capitalize() for col in cols)
-    for d in data_path(repos=Path(args.lexibank_repos)).iterdir():
-        if is_dataset_dir(d):
-            ds = Dataset(d)
-            row = [d.name, short_title(ds.md['dc:title'], l=tl)]
-            for col in cols:
-                if col == 'license':
-                    lic = licenses.find(ds.md.get('dc:license') or '')
-                    row.append(lic.id if lic else ds.md.get('dc:license'))
-                elif col in ['lexemes', 'macroareas']:
-                    mds = list(ds.iter_cldf_metadata())
-                    if col == 'lexemes':
-                        row.append(sum(md.notes['stats']['lexeme_count'] for md in mds))
-                    elif col == 'macroareas':
-                        mas = set()
-                        for md in mds:
-                            mas = mas.union(md.notes['stats']['macroareas'])
-                        row.append(', '.join(sorted(mas)))
-
-            table.append(row)
+    catalog = Catalog(data_path(FNAME, repos=args.lexibank_repos))
+    for ds in iter_datasets(args):
+        row = [ds.id, short_title(ds.md['dc:title'], l=tl)]
+        for col in cols:
+            if col == 'license':
+                lic = licenses.find(ds.md.get('dc:license') or '')
+                row.append(lic.id if lic else ds.md.get('dc:license'))
+            elif col == 'lexemes':
+                row.append(sum(r['lexeme_count'] for r in catalog[ds]))
+            elif col == 'macroareas':
+                mas = set()
+                for r in catalog[ds]:
+                    mas = mas.union(r['macroareas'])
+                row.append(', '.join(sorted(mas)))
+
+        table.append(row)
+    catalog.close()
     print(table.render(tablefmt='simple', sortkey=lambda r: r[0], condensed=False))
 
 
+# Worker state for the process pool used by `with_dataset`. Since workers are forked, this
+# is inherited by the child processes, thus we don't need to pickle `func`:
+_WORKER = {}
+
+
+def _run_dataset(name):
+    args, func, kw = _WORKER['args'], _WORKER['func'], _WORKER['kw']
+    s = time()
+    res, error = None, None
+    memo_stats = memo.stats()
+    try:
+        res = func(get_dataset(args, name), **kw)
+        status = 'ok'
+    except NotImplementedError:
+        status = 'not implemented'
+    except Exception as e:
+        traceback.print_exc()
+        status, error = 'failed', '%s: %s' % (e.__class__.__name__, e)
+    memo.flush()
+    memo_stats = memo.diff_stats(memo_stats)
+    return name, status, time() - s, error, os.getpid(), res, memo_stats
+
+
+def dataset_names(args):
+    return [ds.id for ds in iter_datasets(args)]
+
+
+def _print_memo_stats(stats):
+    stats = memo.format_stats(stats)
+    if stats:
+        print(stats)
+
+
 def with_dataset(args, func):
+    """
+    Run `func` for the dataset specified on the command line or for all datasets.
+
+    When running for all datasets, failures of individual datasets are reported in a
+    summary table at the end, but do not stop the run. With `--jobs N` datasets are
+    processed in a pool of N forked worker processes.
+
+    :return: `list` of the values returned by `func` for successfully processed datasets.
+    """
     if args.args:
-        func(get_dataset(args), **vars(args))
-    else:
-        for d in sorted(
-                data_path(repos=args.lexibank_repos).iterdir(), key=lambda d: d.name):
-            #if d.name == 'abvd':
-            #    continue
-            if d.is_dir() and d.name != '_template' \
-                    and d.joinpath('metadata.json').exists():
-                s = time()
-                print('processing %s ...' % d.name)
-                try:
-                    func(get_dataset(args, d.name), **vars(args))
-                except NotImplementedError:
-                    print('--not implemented--')
-                print('... done %s [%.1f secs]' % (d.name, time() - s))
-                #break
+        try:
+            return [func(get_dataset(args), **vars(args))]
+        finally:
+            memo.flush()
+            _print_memo_stats(memo.stats())
+
+    jobs = getattr(args, 'jobs', 1) or 1
+    _WORKER.update(args=args, func=func, kw=vars(args))
+    start = time()
+    try:
+        if jobs > 1:
+            # Workers must not start pools of their own, because they are daemonic:
+            _WORKER['kw'] = dict(_WORKER['kw'], jobs=1)
+            pool = util.pool(jobs)
+            try:
+                results = list(pool.imap_unordered(_run_dataset, dataset_names(args)))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [_run_dataset(name) for name in dataset_names(args)]
+    finally:
+        _WORKER.clear()
+
+    workers = {pid: i + 1 for i, pid in enumerate(sorted(set(r[4] for r in results)))}
+    table = Table('Worker', 'Dataset', 'Status', 'Time [secs]', 'Error')
+    for name, status, elapsed, error, pid, _, _ in results:
+        table.append([workers[pid], name, status, elapsed, error or ''])
+    print(table.render(
+        tablefmt='simple', sortkey=lambda r: (r[0], r[1]), condensed=False, floatfmt='.1f'))
+    print('%s datasets, %s failed, %s workers [%.1f secs]' % (
+        len(results),
+        len([r for r in results if r[1] == 'failed']),
+        len(workers),
+        time() - start))
+    memo_stats = defaultdict(Counter)
+    for r in results:
+        for n, c in r[6].items():
+            memo_stats[n].update(c)
+    _print_memo_stats(memo_stats)
+    return [r[5] for r in sorted(results, key=lambda r: r[0]) if r[1] == 'ok']
 
 
 def report(args):
     """
     """
+    if args.jobs > 1:
+        # Load CLPA in the main process, so that it is shared with the workers:
+        args.context.preload('clpa')
+
     def _report(ds, **kw):
         ds.report(**kw)
 
     with_dataset(args, _report)
 
 
+def get_lexeme_store(args):
+    return lexemes.LexemeStore(data_path(lexemes.FNAME, repos=args.lexibank_repos))
+
+
+def index(args):
+    """
+    Load the CLDF data of a dataset - or of all datasets - into the lexeme store.
+
+    lexibank index [DATASET_ID]
+
+    Only CSV files which changed since the last run are re-loaded. With `--use-index`,
+    `coverage` and `word_length` query the lexeme store instead of reading the CLDF data.
+    """
+    def _index(ds, **kw):
+        store = get_lexeme_store(args)
+        try:
+            changed = store.update(ds)
+        finally:
+            store.close()
+        if changed:
+            ds.log.info('%s: indexed %s' % (ds.id, ', '.join(changed)))
+
+    with_dataset(args, _index)
+    if not args.args:
+        store = get_lexeme_store(args)
+        store.prune(dataset_names(args))
+        store.close()
+
+
+def query_lexeme_store(args, method):
+    """
+    :return: Single item `list` with the result of a query of the lexeme store, restricted \
+    to the dataset specified on the command line.
+    """
+    store = get_lexeme_store(args)
+    try:
+        return [getattr(store, method)(
+            dataset=get_dataset(args, cls=DatasetInfo).id if args.args else None)]
+    finally:
+        store.close()
+
+
 #  - need set of all concepts per variety.
 #  - loop over concept lists
 #  - if concept ids is subset of variety, count that language.
 def coverage(args):
-    from pyconcepticon.api import Concepticon
-
-    varieties = defaultdict(set)
-
-    def _word_length(ds, **kw):
-        ds.coverage(varieties)
-
-    with_dataset(args, _word_length)
+    def _coverage(ds, **kw):
+        res = defaultdict(set)
+        ds.coverage(res)
+        return dict(res)
 
-    print('varieties', len(varieties))
+    if args.use_index:
+        sources = ['index', query_lexeme_store(args, 'files')[0]]
+    else:
+        sources = ['csv', csv_sources(
+            [get_dataset(args, cls=DatasetInfo)] if args.args else iter_datasets(args))]
+    key = cache_key(sources)
+    matrix = CoverageMatrix.from_cache(key)
+    if matrix is None:
+        varieties = defaultdict(set)
+        if args.use_index:
+            results = query_lexeme_store(args, 'coverage')
+        else:
+            results = with_dataset(args, _coverage)
+        for res in results:
+            for varid, meanings in res.items():
+                varieties[varid].update(meanings)
+        matrix = CoverageMatrix.from_sets(varieties)
+        matrix.to_cache(key)
 
-    c = Concepticon(args.concepticon_repos)
-    res = Counter()
+    print('varieties', len(matrix))
 
-    for cl in c.conceptlists.values():
+    conceptlists = {}
+    for cl in args.context.conceptlists.values():
         try:
-            concepts = set(int(cc.concepticon_id) for cc in cl.concepts.values() if cc.concepticon_id)
+            conceptlists[cl['ID']] = set(
+                int(cc.concepticon_id) for cc in cl.concepts.values() if cc.concepticon_id)
         except:
             continue
-        for varid, meanings in varieties.items():
-            if concepts.issubset(meanings):
-                res.update([cl['ID']])
 
-    t = Table('concept list', 'variety count')
-    for p in res.most_common():
-        t.append(list(p))
+    t = Table(
+        'concept list', 'variety count', 'varieties >= {0:.0%}'.format(PARTIAL_COVERAGE))
+    for row in sorted(
+            matrix.coverage(conceptlists), key=lambda r: (-r[1], -r[2], r[0])):
+        if row[2]:
+            t.append(list(row))
     print(t.render(tablefmt='simple', condensed=False))
 
 """
@@ -203,54 +345,61 @@ def coverage(args):
 
 
 def word_length(args):
-    from pyconcepticon.api import Concepticon
+    """
+    Write the average word length per concept and variety to wordlength.csv.
 
-    c = Concepticon(args.concepticon_repos)
-    res = defaultdict(lambda: defaultdict(list))
+    lexibank [--min-languages N] [--columns COLS] word_length [DATASET_ID]
 
+    Only concepts with forms in at least `--min-languages` varieties are included.
+    `--columns` selects and orders the output columns; in addition to the default ones,
+    `Count` - the number of forms - is available.
+    """
     def _word_length(ds, **kw):
-        ds.word_length(res)
+        return ds.word_length()
 
-    with_dataset(args, _word_length)
-    concepts = c.conceptsets
-    languoids = {l.id: l for l in Glottolog(args.glottolog_repos).languoids()}
+    columns = args.columns.split(',') if args.columns else wordlength.COLUMNS
+    invalid = [c for c in columns if c not in wordlength.COLUMNS + wordlength.EXTRA_COLUMNS]
+    if invalid:
+        raise ParserError('invalid columns: %s' % ', '.join(invalid))
+
+    if args.use_index:
+        results = query_lexeme_store(args, 'word_length')
+    else:
+        results = with_dataset(args, _word_length)
+    res = wordlength.WordLengths()
+    for dsres in results:
+        res.merge(dsres)
+    concepts = args.context.concepticon.conceptsets
+    glottolog = args.context.glottolog
 
     with UnicodeWriter('wordlength.csv') as writer:
-        writer.writerow([
-            'Concepticon_ID',
-            'Gloss',
-            'Semanticfield',
-            'Category',
-            'Glottocode',
-            'Variety',
-            'Family',
-            'Form',
-            'Length'])
-        for pid, langs in res.items():
-            if len(langs) >= 500:
-                for (lang, variety), forms in langs.items():
-                    if lang in languoids:
-                        lengths = [len(f.split()) for f in forms]
-                        lang = languoids[lang]
-                        family = lang.lineage[0][0] if lang.lineage else ''
-                        c = concepts[pid]
-                        writer.writerow([
-                            pid,
-                            c['GLOSS'],
-                            c['SEMANTICFIELD'],
-                            c['ONTOLOGICAL_CATEGORY'],
-                            lang.id,
-                            variety,
-                            family,
-                            forms[0],
-                            sum(lengths)/len(lengths)])
+        writer.writerow(columns)
+        for pid, (lang, variety), count, length, form in res.iter_rows(args.min_languages):
+            if lang in glottolog:
+                c = concepts[pid]
+                row = dict(
+                    Concepticon_ID=pid,
+                    Gloss=c['GLOSS'],
+                    Semanticfield=c['SEMANTICFIELD'],
+                    Category=c['ONTOLOGICAL_CATEGORY'],
+                    Glottocode=lang,
+                    Variety=variety,
+                    Family=glottolog.family(lang),
+                    Form=form,
+                    Length=length,
+                    Count=count)
+                writer.writerow([row[col] for col in columns])
 
 
 def cldf(args):
     """
     Create CLDF datasets from the raw data for a dataset.
 
-    lexibank --glottolog-repos PATH --concepticon-repos PATH cldf [DATASET_ID]
+    lexibank --glottolog-repos PATH --concepticon-repos PATH [--force] [--explain] \
+        cldf [DATASET_ID]
+
+    Datasets whose inputs did not change since the last build are skipped, unless
+    `--force` is specified. `--explain` prints the changed inputs of rebuilt datasets.
     """
     if not args.glottolog_repos or not Path(args.glottolog_repos).exists():
         raise ParserError('Invalid glottolog repository path given')
@@ -258,25 +407,25 @@ def cldf(args):
     if not args.concepticon_repos or not Path(args.concepticon_repos).exists():
         raise ParserError('Invalid concepticon repository path given')
 
-    # FIXME: get dict of all glottolog langs right here, and attach to datasets!
-    try:
-        languoids = load('glottolog')
-    except ValueError:
-        languoids = {l.id: l for l in Glottolog(args.glottolog_repos).languoids()}
-        dump(languoids, 'glottolog')
+    if not args.args and args.jobs > 1:
+        # Load the data in the main process, so that it is shared with the workers:
+        args.context.preload(
+            'glottolog_version', 'concepticon_version', 'glottolog', 'conceptlists', 'clpa')
 
     def _cldf(ds, **kw):
-        ds.glottolog_languoids = languoids
         ds.cldf(**kw)
-        ds.write_cognates()
 
     with_dataset(args, _cldf)
 
 
-def get_badge(words, name, prop=None, ratio=None):
+def get_badge(counts, name, prop=None, ratio=None):
+    """
+    :param counts: `dict` with the total number of words as `lexeme_count` and the number of \
+    words with a value for the property as `prop`.
+    """
     prop = prop or name
-    if words:
-        ratio = len([w for w in words if w.get(prop)]) / float(len(words))
+    if counts and counts['lexeme_count']:
+        ratio = counts[prop] / float(counts['lexeme_count'])
     elif ratio:
         pass
     else:
@@ -355,28 +504,28 @@ def _readme(ds, **kw):
     
     report_by_cldfds = {}
     trlines = []
-    rows = []
+    counts = Counter()
 
     totals = [set(), set(), 0, (0, 0)]
 
-    for cldfds in ds.iter_cldf_datasets():
-        rows.extend(cldfds.rows)
-        stats = cldfds.stats
-        sindex, langs = synonymy_index(cldfds)
-        if langs:
-            sindex /= float(len(langs))
-        else:
-            sindex = 0
-        totals[0] = totals[0].union(langs)
-        totals[1] = totals[1].union(stats['parameters'])
-        totals[2] += len(cldfds)
-        totals[3] = (totals[3][0] + sindex, totals[3][1] + 1)
-
-        report_by_cldfds[cldfds.name] = dict(
-            languages=list(langs),
-            concepts=list(stats['parameters']),
-            lexeme_count=len(cldfds),
-            synonymy_index='%.2f' % sindex)
+    catalog = Catalog.from_dataset(ds)
+    try:
+        records = catalog[ds]
+    finally:
+        catalog.close()
+    for record in records:
+        for col in ['lexeme_count', 'glottolog_count', 'concepticon_count', 'source_count']:
+            counts[col] += record[col]
+        totals[0] = totals[0].union(record['languages'])
+        totals[1] = totals[1].union(record['concepts'])
+        totals[2] += record['lexeme_count']
+        totals[3] = (totals[3][0] + record['synonymy_index'], totals[3][1] + 1)
+
+        report_by_cldfds[record['name']] = dict(
+            languages=record['languages'],
+            concepts=record['concepts'],
+            lexeme_count=record['lexeme_count'],
+            synonymy_index='%.2f' % record['synonymy_index'])
 
     report_by_cldfds['__total__'] = dict(
         language_count=len(totals[0]),
@@ -393,9 +542,9 @@ def _readme(ds, **kw):
     tr = TranscriptionReport(ds, ds.dir.joinpath('transcription.json'))
     stats = tr.report['stats']
     badges = [
-        get_badge(rows, 'Glottolog', 'Language_ID'),
-        get_badge(rows, 'Concepticon', 'Parameter_ID'),
-        get_badge(rows, 'Source')
+        get_badge(counts, 'Glottolog', 'glottolog_count'),
+        get_badge(counts, 'Concepticon', 'concepticon_count'),
+        get_badge(counts, 'Source', 'source_count')
     ]
     if stats['segments']:
         badges.extend([
@@ -443,8 +592,20 @@ def check(args):
     pass
 
 
+class LexibankArgumentParser(ArgumentParser):
+    """
+    Argument parser attaching a `RunContext` - shared by all datasets processed in a
+    run - to the parsed arguments.
+    """
+    def parse_args(self, args=None, namespace=None):
+        args = ArgumentParser.parse_args(self, args=args, namespace=namespace)
+        args.context = RunContext(args.glottolog_repos, args.concepticon_repos)
+        return args
+
+
 def main():
-    parser = ArgumentParser('pylexibank', readme, download, cldf, ls, report, word_length, coverage)
+    parser = LexibankArgumentParser(
+        'pylexibank', readme, download, cldf, ls, report, word_length, coverage, index)
     parser.add_argument(
         '--lexibank-repos',
         help="path to lexibank data repository",
@@ -457,4 +618,50 @@ def main():
         '--concepticon-repos',
         help="path to concepticon data repository",
         default=None)
+    parser.add_argument(
+        '--force',
+        help="rebuild datasets even if their inputs did not change",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--explain',
+        help="print the inputs which changed for datasets which are rebuilt",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--paranoid',
+        help="re-compute checksums of all raw data files when validating raw data",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--stream',
+        help="write transcription reports in chunks, keeping only counts in memory",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--json-format',
+        help="format of transcription.json: %s" % '|'.join(JSON_FORMATS),
+        choices=JSON_FORMATS,
+        default='indented')
+    parser.add_argument(
+        '--jobs',
+        help="number of worker processes to use when processing all datasets - or, for a "
+             "single dataset, for the transcription report and for alignments in cldf",
+        type=int,
+        default=1)
+    parser.add_argument(
+        '--min-languages',
+        help="minimal number of varieties with forms for a concept in word_length",
+        type=int,
+        default=wordlength.MIN_LANGUAGES)
+    parser.add_argument(
+        '--columns',
+        help="comma-separated output columns of word_length: %s" % ','.join(
+            wordlength.COLUMNS + wordlength.EXTRA_COLUMNS),
+        default=None)
+    parser.add_argument(
+        '--use-index',
+        help="query the lexeme store built with `lexibank index` in coverage and word_length",
+        action='store_true',
+        default=False)
     sys.exit(parser.main())
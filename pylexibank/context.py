@@ -0,0 +1,75 @@
+# coding: utf8
+"""
+Resources shared by all datasets processed in one run of the `lexibank` command.
+
+Loading the Concepticon and Glottolog data and computing the versions of the
+repositories is expensive. So a `RunContext` is created once per run, and each resource
+is only loaded when first accessed - and then memoized for all datasets of the run.
+"""
+from __future__ import unicode_literals, print_function, division
+
+from clldutils.misc import cached_property
+from clldutils.path import git_describe
+
+from pylexibank.util import text
+
+
+class RunContext(object):
+    def __init__(self, glottolog_repos=None, concepticon_repos=None):
+        self.glottolog_repos = glottolog_repos
+        self.concepticon_repos = concepticon_repos
+
+    def preload(self, *names):
+        """
+        Load resources eagerly, e.g. before forking worker processes which then inherit
+        them.
+        """
+        for name in names:
+            getattr(self, name)
+
+    @cached_property()
+    def glottolog_version(self):
+        if self.glottolog_repos:
+            return text(git_describe(self.glottolog_repos))
+
+    @cached_property()
+    def concepticon_version(self):
+        if self.concepticon_repos:
+            return text(git_describe(self.concepticon_repos))
+
+    @cached_property()
+    def glottolog(self):
+        """
+        :return: `pylexibank.glottolog.GlottologIndex` instance.
+        """
+        from pylexibank.glottolog import GlottologIndex
+
+        return GlottologIndex.from_repos(
+            self.glottolog_repos, version=self.glottolog_version)
+
+    @cached_property()
+    def concepticon(self):
+        """
+        :return: `pyconcepticon.api.Concepticon` instance.
+        """
+        from pyconcepticon.api import Concepticon
+
+        return Concepticon(self.concepticon_repos)
+
+    @cached_property()
+    def conceptlists(self):
+        """
+        :return: `dict` mapping conceptlist IDs to `pyconcepticon.api.Conceptlist` objects.
+        """
+        return self.concepticon.conceptlists
+
+    @cached_property()
+    def clpa(self):
+        """
+        :return: `pyclpa.base.CLPA` instance.
+        """
+        # `get_clpa` returns a module-level singleton, so loading it here also shares it with
+        # code calling `get_clpa` directly - and with worker processes forked afterwards.
+        from pyclpa.base import get_clpa
+
+        return get_clpa()
@@ -0,0 +1,158 @@
+# coding: utf8
+"""
+Coverage of Concepticon conceptlists by the varieties of all lexibank datasets.
+
+Which concepts a variety has forms for is stored as a row of packed bits of a variety x
+concept matrix. Conceptlists are packed the same way, so the number of concepts of a list
+covered by a variety is the popcount of the AND of two rows - which NumPy computes for all
+varieties and conceptlists at once. Since the matrix only depends on the CLDF data, it is
+cached in the lexibank cache directory, keyed by a fingerprint of the CSV files.
+"""
+from __future__ import unicode_literals, print_function, division
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+from clldutils.path import Path, move
+from pycldf.dataset import MD_SUFFIX
+
+from pylexibank import cache
+from pylexibank.util import text
+
+# Minimal ratio of the concepts of a list a variety must cover to be counted as partial:
+PARTIAL_COVERAGE = 0.9
+# Maximal number of bytes to AND at once, keeping memory bounded for large matrices:
+CHUNK_SIZE = 2 ** 24
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def cache_key(sources):
+    """
+    :param sources: JSON serializable fingerprint of the data the matrix is computed from.
+    """
+    return hashlib.md5(json.dumps(sources, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def csv_sources(datasets):
+    """
+    :param datasets: Iterable of `pylexibank.dataset.DatasetInfo` instances.
+    :return: Fingerprint of the CLDF data of the datasets, i.e. a `list` of triples \
+    (dataset ID, CSV file name, [size, modification time]).
+    """
+    res = []
+    for ds in datasets:
+        for md in ds.iter_cldf_metadata_paths():
+            st = os.stat(md.as_posix()[:-len(MD_SUFFIX)])
+            res.append([ds.id, md.name, [st.st_size, st.st_mtime]])
+    return res
+
+
+class CoverageMatrix(object):
+    def __init__(self, varieties, concepts, bits):
+        """
+        :param varieties: `list` of variety IDs, i.e. row labels.
+        :param concepts: Sorted array of Concepticon IDs, i.e. column labels.
+        :param bits: `uint8` array of the rows packed with `numpy.packbits`.
+        """
+        self.varieties = varieties
+        self.concepts = concepts
+        self.bits = bits
+
+    @classmethod
+    def from_sets(cls, varieties):
+        """
+        :param varieties: `dict` mapping variety IDs to `set`s of Concepticon IDs.
+        """
+        ids = sorted(varieties, key=lambda v: v or '')
+        concepts = np.array(sorted(set().union(*varieties.values())), dtype=np.int64)
+        matrix = np.zeros((len(ids), len(concepts)), dtype=bool)
+        for i, varid in enumerate(ids):
+            matrix[i, np.searchsorted(
+                concepts, np.array(sorted(varieties[varid]), dtype=np.int64))] = True
+        return cls(ids, concepts, np.packbits(matrix, axis=1))
+
+    @staticmethod
+    def _path(key):
+        return cache.DIR.joinpath('coverage', key + '.npz')
+
+    @classmethod
+    def from_cache(cls, key):
+        """
+        :return: The cached matrix for `key` or `None`.
+        """
+        path = cls._path(key)
+        if path.exists():
+            with np.load(path.as_posix()) as data:
+                return cls(
+                    [text(v) for v in data['varieties'].tolist()],
+                    data['concepts'],
+                    data['bits'])
+
+    def to_cache(self, key):
+        """
+        Cache the matrix, replacing the matrices cached for other keys.
+        """
+        path = self._path(key)
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent.as_posix(), suffix='.npz')
+        with os.fdopen(fd, 'wb') as fp:
+            np.savez(
+                fp,
+                varieties=np.array([v or '' for v in self.varieties], dtype=np.unicode_),
+                concepts=self.concepts,
+                bits=self.bits)
+        for p in path.parent.glob('*.npz'):
+            if p.name != Path(tmp).name:
+                p.unlink()
+        move(Path(tmp), path)
+
+    def __len__(self):
+        return len(self.varieties)
+
+    def pack(self, concepts):
+        """
+        :param concepts: Iterable of Concepticon IDs.
+        :return: Packed row selecting the columns of `concepts`.
+        """
+        concepts = np.array(sorted(set(concepts)), dtype=np.int64)
+        idx = np.searchsorted(self.concepts, concepts)
+        known = idx < len(self.concepts)
+        known[known] = self.concepts[idx[known]] == concepts[known]
+        row = np.zeros(len(self.concepts), dtype=bool)
+        row[idx[known]] = True
+        return np.packbits(row)
+
+    def counts(self, masks):
+        """
+        :param masks: `uint8` array of packed rows as returned by `pack`.
+        :return: Array of the number of concepts selected by each mask, which are covered \
+        by each variety, with shape (number of varieties, number of masks).
+        """
+        res = np.zeros((len(self), len(masks)), dtype=np.int32)
+        step = max(1, CHUNK_SIZE // max(1, masks.size))
+        for i in range(0, len(self), step):
+            res[i:i + step] = POPCOUNT[
+                self.bits[i:i + step, np.newaxis, :] & masks[np.newaxis, :, :]
+            ].sum(axis=2, dtype=np.int32)
+        return res
+
+    def coverage(self, conceptlists, partial=PARTIAL_COVERAGE):
+        """
+        :param conceptlists: `dict` mapping conceptlist IDs to `set`s of Concepticon IDs.
+        :param partial: Minimal ratio of covered concepts for partial coverage.
+        :return: `list` of triples (conceptlist ID, number of varieties covering all \
+        concepts, number of varieties covering at least `partial` of the concepts).
+        """
+        ids = sorted(conceptlists)
+        if not ids:
+            return []
+        masks = np.array([self.pack(conceptlists[clid]) for clid in ids], dtype=np.uint8)
+        sizes = np.array([len(conceptlists[clid]) for clid in ids], dtype=np.int32)
+        counts = self.counts(masks)
+        full = (counts == sizes).sum(axis=0)
+        # Rounding first makes sure that e.g. 0.9 * 30 doesn't end up as 28 concepts:
+        partial = (counts >= np.ceil(np.round(partial * sizes, 6))).sum(axis=0)
+        return [(clid, int(f), int(p)) for clid, f, p in zip(ids, full, partial)]
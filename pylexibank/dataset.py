@@ -1,30 +1,41 @@
 # coding: utf8
 from __future__ import unicode_literals, print_function, division
-import logging
+import os
 import re
-from collections import defaultdict, Counter
+import json
+import gzip
+import hashlib
+import logging
+import pickle
+import sqlite3
+import tempfile
+import heapq
+from itertools import groupby
+from collections import defaultdict, Counter, OrderedDict
 
 from clldutils import jsonlib
 from clldutils.dsv import reader
 from clldutils.misc import UnicodeMixin, cached_property
-from clldutils.path import git_describe, Path, import_module
+from clldutils.path import Path, import_module, md5, move
 from clldutils.markup import Table
 from clldutils.clilib import confirm
-from pyconcepticon.api import Concepticon
 from pycldf import csv
 from pycldf.dataset import Dataset as CldfDatasetBase
 from pycldf.dataset import MD_SUFFIX
 from pycldf.metadata import Metadata as CldfMetadataBase
 from tqdm import tqdm
-import bagit
 
 import pylexibank
-from pylexibank.util import data_path
-from pylexibank.lingpy_util import test_sequences
+from pylexibank import cache, memo
+from pylexibank.util import data_path, pool
+from pylexibank.context import RunContext
+from pylexibank.fingerprint import Fingerprint
 
 logging.basicConfig(level=logging.INFO)
 REQUIRED_FIELDS = ('ID', 'Language_ID', 'Parameter_ID', 'Value')
 GC_PATTERN = re.compile('[a-z][a-z0-9]{3}[1-9][0-9]{3}$')
+# Number of cognate judgements to keep in memory before spilling them to disk:
+COGNATES_BUFFER_SIZE = 100000
 
 
 def get_variety_id(row):
@@ -60,52 +71,102 @@ class Metadata(CldfMetadataBase):
                 for o in self.get_table().get('notes', [])}
 
 
-class Dataset(object):
+class DatasetInfo(object):
     """
-    A lexibank dataset.
+    Lightweight access to a lexibank dataset's metadata.
 
-    This object provides access to a dataset's
-    - python module as attribute `commands`
-    - language list as attribute `languages`
-    - concept list as attribute `concepts`
-    - concepticon concept-list ID as attribute `conceptlist`
+    Only `metadata.json` is read upon initialization; the dataset's python module (which
+    typically imports lots of other packages), its language list and its concept list are
+    only loaded when first accessed.
     """
     def __init__(self, path):
-        """
-        A dataset is initialzed passing its directory path.
-        """
         path = Path(path)
         self.id = path.name
-        self.log = logging.getLogger(pylexibank.__name__)
         self.dir = path
         self.raw = self.dir.joinpath('raw', 'data')
-        if not self.raw.exists():
-            self.raw.mkdir()
         self.cldf_dir = self.dir.joinpath('cldf')
-        if not self.cldf_dir.exists():
-            self.cldf_dir.mkdir()
-        self.commands = import_module(self.dir)
         self.md = jsonlib.load(self.dir.joinpath('metadata.json'))
-        self.languages = []
+        self.conceptlist = None
+        url = self.md.get('dc:conformsTo')
+        if url and url.startswith('http://concepticon.clld.org/contributions/'):
+            self.conceptlist = url.split('/')[-1]
+
+    @cached_property()
+    def commands(self):
+        return import_module(self.dir)
+
+    @cached_property()
+    def languages(self):
+        res = []
         lpath = self.dir.joinpath('languages.csv')
         if lpath.exists():
             for item in reader(lpath, dicts=True):
                 if item['GLOTTOCODE'] and not GC_PATTERN.match(item['GLOTTOCODE']):
                     raise ValueError("Wrong glottocode for item {0}".format(
                         item['GLOTTOCODE']))
-                self.languages.append(item)
-        self.conceptlist = None
-        url = self.md.get('dc:conformsTo')
-        if url and url.startswith('http://concepticon.clld.org/contributions/'):
-            self.conceptlist = url.split('/')[-1]
-        self.concepts = []
+                res.append(item)
+        return res
+
+    @cached_property()
+    def concepts(self):
         cpath = self.dir.joinpath('concepts.csv')
         if cpath.exists():
-            self.concepts = list(reader(cpath, dicts=True))
+            return list(reader(cpath, dicts=True))
+        return []
+
+    def iter_cldf_metadata_paths(self):
+        """
+        :return: A generator yielding the paths of CLDF metadata files.
+        """
+        if self.cldf_dir.exists():
+            for fname in sorted(
+                    self.cldf_dir.glob('*' + MD_SUFFIX), key=lambda f: f.name):
+                yield fname
+
+    def _iter_cldf(self, factory):
+        for fname in self.iter_cldf_metadata_paths():
+            yield factory(fname)
+
+    def iter_cldf_metadata(self):
+        """
+        :return: A generator yielding CLDF metadata objects.
+        """
+        return self._iter_cldf(Metadata.from_file)
+
+    def iter_cldf_datasets(self):
+        """
+        :return: A generator yielding CLDF datasets.
+        """
+        return self._iter_cldf(CldfDatasetBase.from_metadata)
+
+
+class Dataset(DatasetInfo):
+    """
+    A lexibank dataset.
+
+    This object provides access to a dataset's
+    - python module as attribute `commands`
+    - language list as attribute `languages`
+    - concept list as attribute `concepts`
+    - concepticon concept-list ID as attribute `conceptlist`
+    """
+    def __init__(self, path):
+        """
+        A dataset is initialzed passing its directory path.
+        """
+        DatasetInfo.__init__(self, path)
+        self.log = logging.getLogger(pylexibank.__name__)
+        if not self.raw.exists():
+            self.raw.mkdir(parents=True)
+        if not self.cldf_dir.exists():
+            self.cldf_dir.mkdir()
+        # Import the module and validate the language list right away:
+        for attr in ['commands', 'languages']:
+            getattr(self, attr)
         self.cognates = Cognates()
 
         # the following attributes are only set when a dataset's cldf method is run:
-        self.glottolog_languoids = {}
+        self.glottolog = None
         self.glottolog_version, self.concepticon_version = None, None
 
     @classmethod
@@ -122,30 +183,23 @@ class Dataset(object):
 
         .. note:: This property is only valid within the `cldf` method.
         """
-        return {l.iso_code: l.id for l in self.glottolog_languoids.values() if l.iso_code}
+        return dict(self.glottolog.iso2glottocode) if self.glottolog is not None else {}
 
-    def _iter_cldf(self, factory):
-        for fname in sorted(self.cldf_dir.glob('*' + MD_SUFFIX), key=lambda f: f.name):
-            yield factory(fname)
+    def write_cognates(self):
+        self.cognates.write(self.cldf_dir)
 
-    def iter_cldf_metadata(self):
+    @property
+    def cognate_index(self):
         """
-        :return: A generator yielding CLDF metadata objects.
+        :return: `CognateIndex` for the cognates table of the dataset.
         """
-        return self._iter_cldf(Metadata.from_file)
+        return CognateIndex(self.cldf_dir)
 
-    def iter_cldf_datasets(self):
+    def cognate_stats(self):
         """
-        :return: A generator yielding CLDF datasets.
+        :return: pair (number of cognate judgements, number of cognate sets).
         """
-        return self._iter_cldf(CldfDatasetBase.from_metadata)
-
-    def write_cognates(self):
-        self.cognates.write(self.cldf_dir)
-
-    def cognate_stats(self):
-        cognates = self.cognates.read(self.cldf_dir)
-        return len(cognates), len(set(r['Cognate_set_ID'] for r in cognates))
+        return self.cognate_index.stats
 
     def _run_command(self, name, *args, **kw):
         """
@@ -162,28 +216,65 @@ class Dataset(object):
             getattr(self.commands, name)(self, *args, **kw)
 
     def cldf(self, **kw):
-        self.glottolog_version = git_describe(kw['glottolog_repos'])
-        self.concepticon_version = git_describe(kw['concepticon_repos'])
+        """
+        Run the dataset's `cldf` command - unless its inputs haven't changed since the
+        last successful build.
+
+        :param kw: Keyword arguments are passed to the command, `context` is the \
+        `RunContext` providing Glottolog and Concepticon data, `force=True` triggers a \
+        rebuild of an up-to-date dataset, `explain=True` prints the inputs which changed, \
+        `paranoid=True` re-computes the checksums of all raw data files.
+        :return: `True` if the dataset was (re-)built, `False` otherwise.
+        """
+        import bagit
+        from pylexibank.bag import is_valid, update_checksums
+
+        context = kw.get('context') or RunContext(
+            kw.get('glottolog_repos'), kw.get('concepticon_repos'))
+        self.glottolog_version = context.glottolog_version
+        self.concepticon_version = context.concepticon_version
         try:
             bag = bagit.Bag(self.raw.parent.as_posix())
-            if not bag.is_valid():
+            if not is_valid(bag, paranoid=kw.get('paranoid')):
                 if confirm('The downloaded data has changed. Update checksums?'):
-                    bag.save(manifests=True)
-                    assert bag.is_valid()
+                    update_checksums(bag)
+                    assert is_valid(bag)
                 else:
                     raise bagit.BagError('invalid raw data')
-            concepticon = Concepticon(kw['concepticon_repos'])
+            fingerprint = Fingerprint.from_dataset(
+                self, self.glottolog_version, self.concepticon_version)
+            previous = Fingerprint.load(self)
+            changed = fingerprint.diff(previous) if previous else ['no previous build']
+            if not changed and not kw.get('force'):
+                self.log.info('dataset %s is up-to-date' % self.id)
+                return False
+            if kw.get('explain'):
+                print('%s: %s' % (self.id, ', '.join(changed or ['forced rebuild'])))
+            self.glottolog = context.glottolog
             if self.conceptlist:
-                self.conceptlist = concepticon.conceptlists[self.conceptlist]
-            self._run_command('cldf', concepticon, **kw)
+                self.conceptlist = context.conceptlists[self.conceptlist]
+            self._run_command('cldf', context.concepticon, **kw)
+            self.write_cognates()
+            fingerprint.save(self)
+            return True
         except bagit.BagError:
             self.log.error('invalid raw data for dataset %s' % self.id)
+        return False
+
+    def word_length(self, res=None):
+        """
+        :param res: Optional `pylexibank.wordlength.WordLengths` instance to add to.
+        :return: `pylexibank.wordlength.WordLengths` instance.
+        """
+        from pylexibank.wordlength import WordLengths
 
-    def word_length(self, res):
+        res = WordLengths() if res is None else res
         for cldfds in self.iter_cldf_datasets():
-            for row in cldfds.rows:
-                if row['Parameter_ID'] and row['Language_ID'] and row.get('Segments'):
-                    res[row['Parameter_ID']][(row['Language_ID'], get_variety_id(row))].append(row['Segments'])
+            res.add(
+                (row['Parameter_ID'], row['Language_ID'], get_variety_id(row), row['Segments'])
+                for row in cldfds.rows
+                if row['Parameter_ID'] and row['Language_ID'] and row.get('Segments'))
+        return res
 
     def coverage(self, vars):
         for cldfds in self.iter_cldf_datasets():
@@ -196,13 +287,36 @@ class Dataset(object):
 
     def report(self, **kw):
         rep = TranscriptionReport(self, self.dir.joinpath('transcription.json'))
-        res = rep.run(**getattr(self.commands, 'TRANSCRIPTION_REPORT_CFG', {}))
+        res = rep.run(
+            processes=kw.get('jobs') or 1,
+            stream=kw.get('stream', False),
+            json_format=kw.get('json_format') or 'indented',
+            **getattr(self.commands, 'TRANSCRIPTION_REPORT_CFG', {}))
         if res:
             with self.dir.joinpath('TRANSCRIPTION.md').open('w', encoding='utf8') as fp:
-                fp.write(res)
+                if kw.get('stream'):
+                    for chunk in res:
+                        fp.write(chunk)
+                else:
+                    fp.write(res)
+
+
+def _iter_run(fp):
+    fp.seek(0)
+    while True:
+        try:
+            yield pickle.load(fp)
+        except EOFError:
+            break
 
 
 class Cognates(list):
+    """
+    A list of cognate judgements, i.e. rows of a CLDF cognates table.
+
+    To keep memory bounded, rows are spilled to sorted runs in temporary files once the
+    list grows beyond `max_size` items.
+    """
     fields = [
         'Word_ID',
         'Wordlist_ID',
@@ -221,21 +335,167 @@ class Cognates(list):
     }
     table['tableSchema']['columns'][0]['valueUrl'] = '{Wordlist_ID}.csv#{Word_ID}'
 
+    def __init__(self, max_size=None):
+        list.__init__(self)
+        self.max_size = max_size or COGNATES_BUFFER_SIZE
+        self._runs = []
+        self._count = 0  # Number of rows which have been spilled to runs.
+
+    def append(self, row):
+        list.append(self, row)
+        if len(self) >= self.max_size:
+            self.spill()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __iadd__(self, rows):
+        self.extend(rows)
+        return self
+
+    @staticmethod
+    def _key(row):
+        return row[3], row[1], row[0]
+
+    def _sorted(self):
+        """
+        :return: Rows in memory sorted and decorated as (key, index, row) triples, where \
+        the index of the row in the whole list keeps the sort stable across runs.
+        """
+        return sorted(
+            ((self._key(row), self._count + i, row) for i, row in enumerate(self)),
+            key=lambda r: r[:2])
+
+    def spill(self):
+        """
+        Write the rows in memory to a sorted run in a temporary file.
+        """
+        if self:
+            fp = tempfile.TemporaryFile()
+            for item in self._sorted():
+                pickle.dump(item, fp, pickle.HIGHEST_PROTOCOL)
+            fp.flush()
+            self._runs.append(fp)
+            self._count += len(self)
+            del self[:]
+
+    def iter_sorted(self):
+        """
+        :return: Generator of all rows, sorted by cognate set, wordlist and word ID.
+        """
+        # We merge decorated tuples, since `heapq.merge` has no `key` argument on python 2:
+        for _, _, row in heapq.merge(*[_iter_run(fp) for fp in self._runs] + [self._sorted()]):
+            yield row
+
     def write(self, container):
-        cognatesets = Counter(r[3] for r in self)
         with csv.Writer(self.table, container=container) as writer:
-            for row in sorted(self, key=lambda r: (r[3], r[1], r[0])):
-                if cognatesets[row[3]] > 1:
-                    row = list(row)
-                    if isinstance(row[7], list):
-                        row[7] = ' '.join(row[7])
-                    writer.writerow(row)
+            for _, rows in groupby(self.iter_sorted(), key=lambda r: r[3]):
+                rows = list(rows)
+                if len(rows) > 1:  # We don't write singleton cognate sets.
+                    for row in rows:
+                        row = list(row)
+                        if isinstance(row[7], list):
+                            row[7] = ' '.join(row[7])
+                        writer.writerow(row)
 
     def read(self, container):
         with csv.Reader(self.table, container=container) as reader:
             return list(reader)
 
 
+class CognateIndex(object):
+    """
+    Indexed, read-only access to the cognates table of a dataset.
+
+    The index is cached next to the CSV file as pickle - invalidated when size or
+    modification time of the CSV file change. The cache starts with a header holding the
+    statistics, so these can be read without loading the whole index.
+    """
+    def __init__(self, container):
+        self.path = Path(container).joinpath(Cognates.table['url'])
+        self.cache = self.path.parent.joinpath(self.path.name + '.index')
+        self._header, self._index = None, None
+
+    def _stat(self):
+        st = os.stat(self.path.as_posix())
+        return [st.st_size, getattr(st, 'st_mtime_ns', st.st_mtime)]
+
+    def _load(self, header_only=False):
+        if self._header is None or (not header_only and self._index is None):
+            if not self.path.exists():
+                self._header, self._index = \
+                    dict(stat=None, count=0, cognateset_count=0), ([], {}, {})
+                return
+            stat = self._stat()
+            if self.cache.exists():
+                with self.cache.open('rb') as fp:
+                    header = pickle.load(fp)
+                    if header['stat'] == stat:
+                        self._header = header
+                        if not header_only:
+                            self._index = pickle.load(fp)
+                        return
+            self._build(stat)
+
+    def _build(self, stat):
+        rows, words, cognatesets = [], OrderedDict(), OrderedDict()
+        for i, row in enumerate(Cognates().read(self.path.parent)):
+            rows.append(list(row.values()))
+            words.setdefault(row['Word_ID'], []).append(i)
+            cognatesets.setdefault(row['Cognate_set_ID'], []).append(i)
+        self._header = dict(
+            stat=stat, count=len(rows), cognateset_count=len(cognatesets))
+        self._index = (rows, words, cognatesets)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent.as_posix())
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(self._header, fp, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self._index, fp, pickle.HIGHEST_PROTOCOL)
+        if self.cache.exists():
+            self.cache.unlink()
+        os.rename(tmp, self.cache.as_posix())
+
+    @property
+    def stats(self):
+        """
+        :return: pair (number of cognate judgements, number of cognate sets).
+        """
+        self._load(header_only=True)
+        return self._header['count'], self._header['cognateset_count']
+
+    def _rows(self, indices):
+        return [OrderedDict(zip(Cognates.fields, self._index[0][i])) for i in indices]
+
+    def __len__(self):
+        return self.stats[0]
+
+    def __iter__(self):
+        self._load()
+        return iter(self._rows(range(len(self._index[0]))))
+
+    @property
+    def cognatesets(self):
+        """
+        :return: `list` of cognate set IDs.
+        """
+        self._load()
+        return list(self._index[2].keys())
+
+    def by_word(self, word_id):
+        """
+        :return: `list` of rows for a word.
+        """
+        self._load()
+        return self._rows(self._index[1].get(word_id, []))
+
+    def by_cognateset(self, cognateset_id):
+        """
+        :return: `list` of rows for the members of a cognate set.
+        """
+        self._load()
+        return self._rows(self._index[2].get(cognateset_id, []))
+
+
 def valid_Value(row):
     return bool(row['Value']) and row['Value'] not in ['?', '-']
 
@@ -245,40 +505,403 @@ VALIDATORS = {
 }
 
 
+class LanguageReport(dict):
+    """
+    Transcription report for one language variety.
+
+    Reports for parts of the data of a variety can be merged.
+    """
+    def __init__(self):
+        dict.__init__(
+            self,
+            invalid=Counter(),
+            segments=Counter(),
+            lingpy_errors=set(),
+            clpa_errors=set(),
+            replacements=defaultdict(set),
+            general_errors=0,
+            word_errors=0,
+            bad_words=[],
+            segment_types=Counter())
+
+    def merge(self, other):
+        for attr in ['invalid', 'segments', 'segment_types']:
+            self[attr].update(other[attr])
+        for attr in ['lingpy_errors', 'clpa_errors']:
+            self[attr] |= set(other[attr])
+        for segment, repls in other['replacements'].items():
+            self['replacements'][segment].update(repls)
+        for attr in ['general_errors', 'word_errors']:
+            self[attr] += other[attr]
+        self['bad_words'].extend(other['bad_words'])
+        return self
+
+    def to_json(self):
+        """
+        :return: JSON serializable `OrderedDict` - without the list of bad words.
+        """
+        res = OrderedDict()
+        for attr, value in self.items():
+            if attr == 'replacements':
+                value = OrderedDict((k, sorted(v)) for k, v in value.items())
+            elif isinstance(value, set):
+                value = sorted(value)
+            if attr != 'bad_words':
+                res[attr] = value
+        return res
+
+    @classmethod
+    def from_json(cls, d, bad_words):
+        return cls().merge(dict(d, bad_words=bad_words))
+
+
+class LanguageReports(OrderedDict):
+    """
+    Mapping of language variety IDs to `LanguageReport` objects, ordered by first access.
+    """
+    def __missing__(self, key):
+        self[key] = LanguageReport()
+        return self[key]
+
+
+class Rows(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+
+# Configuration and loaded data of the worker processes used by `TranscriptionReport.run`:
+_REPORT_WORKER = {}
+REPORT_CHUNK_SIZE = 10000
+# Bad words are passed around as lists of the following values, where `Segments` is the
+# value of the analysed column:
+BAD_WORD_COLS = ['lid', 'ID', 'Language_name', 'Parameter_name', 'Value', 'Segments']
+
+
+def _analyse_chunk(arg):
+    i, (fname, start, end) = arg
+    from pylexibank.lingpy_util import test_sequences, SegmentTable
+
+    cfg = _REPORT_WORKER['cfg']
+    memo_stats = memo.stats()
+    if _REPORT_WORKER.get('fname') != fname:
+        # Consecutive chunks of the same CLDF dataset don't need to re-read the data.
+        _REPORT_WORKER.update(fname=fname, ds=CldfDatasetBase.from_metadata(fname))
+    table = _REPORT_WORKER.setdefault('table', SegmentTable())
+    report = LanguageReports()
+    bad_words = [
+        [get_variety_id(row)] + [row.get(k) for k in
+                                 ['ID', 'Language_name', 'Parameter_name', 'Value']] +
+        [row.get(cfg['column'])]
+        for row in test_sequences(
+            Rows(_REPORT_WORKER['ds'].rows[start:end]),
+            get_variety_id,
+            report,
+            table=table,
+            **cfg)]
+    # Items memoized in pool workers would be lost when the pool exits:
+    memo.flush()
+    return i, list(report.items()), bad_words, memo.diff_stats(memo_stats)
+
+
+class BadWordSpool(object):
+    """
+    Stores the bad words found when running a transcription report in a temporary SQLite
+    database, rather than in memory.
+    """
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            'CREATE TABLE words (pk INTEGER PRIMARY KEY, file TEXT, %s)' % ', '.join(
+                '"%s" TEXT' % col for col in BAD_WORD_COLS))
+        self.db.execute('CREATE INDEX words_lid ON words (lid, pk)')
+        self.db.execute('CREATE INDEX words_file ON words (file, pk)')
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _select(self, where='', params=()):
+        return (list(row) for row in self.db.execute(
+            'SELECT %s FROM words %s ORDER BY pk' % (
+                ', '.join('"%s"' % col for col in BAD_WORD_COLS), where),
+            params))
+
+    def extend(self, rows, fname=None):
+        self.db.executemany(
+            'INSERT INTO words (file, %s) VALUES (?, %s)' % (
+                ', '.join('"%s"' % col for col in BAD_WORD_COLS),
+                ', '.join('?' for _ in BAD_WORD_COLS)),
+            [[fname] + list(row) for row in rows])
+        self.count += len(rows)
+
+    def __iter__(self):
+        return self._select()
+
+    def rows(self, fname):
+        return self._select('WHERE file = ?', (fname,))
+
+    def ids(self, lid):
+        for row in self.db.execute(
+                'SELECT "ID" FROM words WHERE lid = ? ORDER BY pk', (lid,)):
+            yield row[0]
+
+    def close(self):
+        self.db.close()
+        os.remove(self.path)
+
+
+JSON_FORMATS = ['indented', 'compact', 'gzip']
+
+
+def _iter_json(obj, lists):
+    """
+    Serialize an object as compact JSON, splicing in lists which are streamed.
+
+    :param lists: `dict` mapping placeholder strings used as values in `obj` to callables \
+    returning an iterator over the items of the list to be written in their place.
+    """
+    text = json.dumps(obj)
+    pos = 0
+    if lists:
+        pattern = re.compile('|'.join(re.escape(json.dumps(k)) for k in lists))
+        for match in pattern.finditer(text):
+            yield text[pos:match.start()]
+            yield '['
+            for i, item in enumerate(lists[json.loads(match.group())]()):
+                yield (', ' if i else '') + json.dumps(item)
+            yield ']'
+            pos = match.end()
+    yield text[pos:]
+
+
 class TranscriptionReport(UnicodeMixin):
+    """
+    A report on the transcriptions in the CLDF datasets of a dataset.
+
+    The language reports and the list of bad words for each CLDF CSV file are stored along
+    with a checksum of the file in the lexibank cache directory, keyed by dataset ID and
+    configuration of the analysis. Thus, subsequent runs only need to analyse files which
+    changed.
+    """
     def __init__(self, dataset, fname):
         self.dataset = dataset
         self.fname = fname
-        if fname.exists():
-            try:
+        self.report = {}
+        # Streaming runs don't keep the bad words in memory, so we record their number:
+        self.bad_word_count = None
+        try:
+            if fname.exists():
                 self.report = jsonlib.load(fname)
+            elif self.gzip_fname.exists():
+                with gzip.open(self.gzip_fname.as_posix(), 'rb') as fp:
+                    self.report = json.loads(fp.read().decode('utf8'))
+        except ValueError:
+            pass
+
+    @property
+    def gzip_fname(self):
+        return self.fname.parent.joinpath(self.fname.name + '.gz')
+
+    def _files_path(self, config):
+        return cache.DIR.joinpath('transcription', self.dataset.id, config + '.json')
+
+    def _read_files(self, config):
+        """
+        :return: `dict` mapping CSV file names to the cached results of their analysis.
+        """
+        path = self._files_path(config)
+        if path.exists():
+            try:
+                return jsonlib.load(path)
             except ValueError:
-                self.report = {}
+                pass
+        return {}
+
+    def _write_files(self, config, files, bad_words=None):
+        """
+        Cache the results of the analysis of each CSV file, replacing results cached for
+        other configurations.
+
+        :param bad_words: `BadWordSpool` holding the bad words of a streaming run.
+        """
+        path = self._files_path(config)
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        lists = {}
+        if bad_words is not None:
+            obj = OrderedDict()
+            for i, (name, entry) in enumerate(files.items()):
+                key = '__bad_words_%s_%s__' % (id(lists), i)
+                lists[key] = lambda name=name: bad_words.rows(name)
+                obj[name] = dict(entry, bad_words=key)
+            files = obj
+        fd, tmp = tempfile.mkstemp(dir=path.parent.as_posix(), suffix='.json')
+        with os.fdopen(fd, 'wb') as fp:
+            for chunk in _iter_json(files, lists):
+                fp.write(chunk.encode('utf8'))
+        for p in path.parent.iterdir():
+            if p.name != Path(tmp).name:
+                p.unlink()
+        move(Path(tmp), path)
+
+    def write(self, json_format='indented', bad_words=None):
+        """
+        Write the report as JSON.
+
+        :param json_format: One of `JSON_FORMATS`.
+        :param bad_words: `BadWordSpool` holding the bad words of a streaming run. The \
+        lists of bad words in the report are replaced with the ones from the spool.
+        """
+        if json_format == 'indented' and bad_words is None:
+            jsonlib.dump(self.report, self.fname, indent=4)
+            fname, other = self.fname, self.gzip_fname
         else:
-            self.report = {}
+            fname, other = \
+                (self.gzip_fname, self.fname) if json_format == 'gzip' else \
+                (self.fname, self.gzip_fname)
+            obj, lists = self.report, {}
+            if bad_words is not None:
+                def placeholder(func):
+                    key = '__bad_words_%s_%s__' % (id(lists), len(lists))
+                    lists[key] = func
+                    return key
+
+                obj = OrderedDict()
+                for key, value in self.report.items():
+                    if key == 'stats':
+                        value = dict(value, bad_words=placeholder(lambda: (
+                            id_ for lid in self.report if lid != 'stats'
+                            for id_ in bad_words.ids(lid))))
+                    else:
+                        value = dict(
+                            value, bad_words=placeholder(lambda key=key: bad_words.ids(key)))
+                    obj[key] = value
+            with (gzip.open if json_format == 'gzip' else open)(fname.as_posix(), 'wb') as fp:
+                for chunk in _iter_json(obj, lists):
+                    fp.write(chunk.encode('utf8'))
+        if other.exists():
+            other.unlink()
+
+    def chunks(self, fnames, processes=1):
+        """
+        Split the analysis into chunks of rows of CLDF datasets.
+
+        :param fnames: Paths of the metadata files of the CLDF datasets to analyse.
+        :return: `list` of (metadata path, start, end) triples.
+        """
+        res = []
+        for fname in fnames:
+            count = Metadata.from_file(fname).notes.get('stats', {}).get('lexeme_count')
+            nchunks = min(processes, -(-count // REPORT_CHUNK_SIZE)) if count else 1
+            if nchunks > 1:
+                size = -(-count // nchunks)
+                for start in range(0, count, size):
+                    # The last chunk also covers rows not counted in the metadata:
+                    res.append((fname, start, start + size if start + size < count else None))
+            else:
+                res.append((fname, 0, None))
+        return res
+
+    def run(self, processes=1, stream=False, json_format='indented', **cfg):
+        """
+        :param processes: Number of worker processes to use for the analysis.
+        :param stream: Flag signaling whether to spool bad words to disk - rather than \
+        keeping them in memory - and to write the report in chunks.
+        :param json_format: One of `JSON_FORMATS`; streaming runs write compact JSON.
+        :param cfg: Configuration passed into `pylexibank.lingpy_util.test_sequences`.
+        :return: The markdown of the detailed report - as iterator of text chunks for \
+        streaming runs - or `None` for datasets which are not segmentized.
+        """
+        from pylexibank.lingpy_util import VERSIONS
 
-    def run(self, **cfg):
         cfg.setdefault('column', 'Value')
         cfg.setdefault('segmentized', False)
-        self.report = defaultdict(lambda: dict(
-            invalid=Counter(),
-            segments=Counter(),
-            lingpy_errors=set(),
-            clpa_errors=set(),
-            replacements=defaultdict(set),
-            general_errors=0,
-            word_errors=0,
-            bad_words=[],
-            segment_types=Counter(),
-        ))
-        bad_words = []
-        with tqdm(
-                total=len(list(self.dataset.iter_cldf_metadata())),
-                desc='cldf-ds',
-                leave=False) as pbar:
-            for ds in self.dataset.iter_cldf_datasets():
-                bad_words.extend(test_sequences(ds, get_variety_id, self.report, **cfg))
-                pbar.update(1)
+        # Results of previous runs can only be re-used, if the configuration and the
+        # versions of the libraries used for the analysis are the same:
+        config = hashlib.md5(
+            json.dumps([VERSIONS, cfg], sort_keys=True, default=repr).encode('utf8')
+        ).hexdigest()
+        cached = self._read_files(config)
+
+        files = []
+        for fname in self.dataset.iter_cldf_metadata_paths():
+            csv_path = fname.parent.joinpath(fname.name[:-len(MD_SUFFIX)])
+            files.append((csv_path.name, md5(csv_path) if csv_path.exists() else None, fname))
+        files = [
+            (name, checksum, fname,
+             cached[name] if name in cached and cached[name]['md5'] == checksum else None)
+            for name, checksum, fname in files]
+        chunks = self.chunks(
+            [fname for _, _, fname, entry in files if entry is None], processes=processes)
+        nchunks = Counter(chunk[0] for chunk in chunks)
+
+        self.report = LanguageReports()
+        entries = OrderedDict()
+        bad_words = BadWordSpool() if stream else []
+        _REPORT_WORKER.update(cfg=cfg)
+        try:
+            with tqdm(total=len(chunks), desc='cldf-ds', leave=False) as pbar:
+                if processes > 1 and len(chunks) > 1:
+                    p = pool(processes)
+                    results = p.imap(_analyse_chunk, enumerate(chunks))
+                else:
+                    p, results = None, (_analyse_chunk(chunk) for chunk in enumerate(chunks))
+                try:
+                    # Results are merged in the order of the files and chunks, so the report
+                    # doesn't depend on the scheduling of the workers or on which files were
+                    # analysed in previous runs:
+                    for name, checksum, fname, entry in files:
+                        if entry is not None:
+                            ids = defaultdict(list)
+                            for row in entry['bad_words']:
+                                ids[row[0]].append(row[1])
+                            languages = [
+                                (lid, LanguageReport.from_json(lreport, ids[lid]))
+                                for lid, lreport in entry['languages']]
+                            bad = entry['bad_words']
+                            if stream:
+                                bad_words.extend(bad, fname=name)
+                                bad = []
+                                for _, lreport in languages:
+                                    lreport['bad_words'] = []
+                        else:
+                            file_report, bad = LanguageReports(), []
+                            for _ in range(nchunks[fname]):
+                                _, report, chunk_bad, memo_stats = next(results)
+                                if p:
+                                    memo.add_stats(memo_stats)
+                                for lid, lreport in report:
+                                    if stream:
+                                        # The IDs are looked up in the spool when writing.
+                                        lreport['bad_words'] = []
+                                    file_report[lid].merge(lreport)
+                                if stream:
+                                    bad_words.extend(chunk_bad, fname=name)
+                                else:
+                                    bad.extend(chunk_bad)
+                                pbar.update(1)
+                            languages = list(file_report.items())
+                        entries[name] = OrderedDict([
+                            ('md5', checksum),
+                            ('languages', [[lid, lr.to_json()] for lid, lr in languages]),
+                            ('bad_words', bad),
+                        ])
+                        for lid, lreport in languages:
+                            self.report[lid].merge(lreport)
+                        if not stream:
+                            bad_words.extend(bad)
+                finally:
+                    if p:
+                        p.close()
+                        p.join()
+        except:  # noqa: E722
+            if stream:
+                bad_words.close()
+            raise
+        finally:
+            _REPORT_WORKER.clear()
 
         stats = dict(
             invalid=set(),
@@ -321,13 +944,34 @@ class TranscriptionReport(UnicodeMixin):
             stats[attr] = len(stats[attr])
         for segment in stats['replacements']:
             stats['replacements'][segment] = sorted(stats['replacements'][segment])
+        self.bad_word_count = len(bad_words)
 
         self.report['stats'] = stats
-        jsonlib.dump(self.report, self.fname, indent=4)
+        try:
+            self.write(json_format=json_format, bad_words=bad_words if stream else None)
+            self._write_files(config, entries, bad_words=bad_words if stream else None)
+        except:  # noqa: E722
+            if stream:
+                bad_words.close()
+            raise
 
         if not cfg.get('segmentized'):
+            if stream:
+                bad_words.close()
             return
 
+        if stream:
+            return self._iter_md(stats, bad_words)
+        return ''.join(self._iter_md(stats, bad_words))
+
+    def _iter_md(self, stats, bad_words):
+        def analyzed(row):
+            return ' '.join(
+                '<s> %s </s>' % segment
+                if segment in stats['lingpy_errors_types']
+                or segment in stats['clpa_errors_types'] else segment
+                for segment in row['Segments'].split(' '))
+
         segments = Table('Segment', 'Occurrence', 'LingPy', 'CLPA')
         for a, b in sorted(stats['segment_types'].items(), key=lambda x: (-x[1], x[0])):
             c, d = '✓', '✓'
@@ -337,33 +981,47 @@ class TranscriptionReport(UnicodeMixin):
                     if a not in stats['clpa_errors_types'] else '?'
             segments.append([a, b, c, d])
 
+        yield """\
+# Detailed transcription record
+
+## Segments
+
+{0}
+## Words
+
+""".format(segments.render(verbose=True))
+
         words = Table('ID', 'LANGUAGE', 'CONCEPT', 'VALUE', 'SEGMENTS')
+        if isinstance(bad_words, BadWordSpool):
+            # We write the table row by row, thus the columns are not padded.
+            try:
+                yield '| %s |\n' % ' | '.join(words.columns)
+                yield '|%s|\n' % '|'.join(':---' for _ in words.columns)
+                for row in bad_words:
+                    row = dict(zip(BAD_WORD_COLS, row))
+                    yield '| %s |\n' % ' | '.join([
+                        row['ID'],
+                        row['Language_name'],
+                        row['Parameter_name'],
+                        row['Value'],
+                        analyzed(row)])
+                yield '\n(%s rows)\n\n' % len(bad_words)
+            finally:
+                bad_words.close()
+            return
+
         with tqdm(total=len(bad_words), desc='bad-lexemes', leave=False) as pbar:
             for i, row in enumerate(bad_words):
-                analyzed = []
-                for segment in row[cfg['column']].split(' '):
-                    if segment in stats['lingpy_errors_types'] \
-                            or segment in stats['clpa_errors_types']:
-                        analyzed.append('<s> %s </s>' % segment)
-                    else:
-                        analyzed.append(segment)
+                row = dict(zip(BAD_WORD_COLS, row))
                 words.append([
                     row['ID'],
                     row['Language_name'],
                     row['Parameter_name'],
                     row['Value'],
-                    ' '.join(analyzed)])
+                    analyzed(row)])
                 if i % 10 == 0:
                     pbar.update(10)
-        return """\
-# Detailed transcription record
-
-## Segments
-
-{0}
-## Words
-
-{1}""".format(segments.render(verbose=True), words.render(verbose=True))
+        yield words.render(verbose=True)
 
     def __unicode__(self):
         md = """## Transcription Report
@@ -384,7 +1042,8 @@ class TranscriptionReport(UnicodeMixin):
             self.report['stats']['word_errors'], 
             self.report['stats']['lingpy_errors'],
             self.report['stats']['clpa_errors'],
-            len(self.report['stats']['bad_words']),
+            len(self.report['stats']['bad_words'])
+            if self.bad_word_count is None else self.bad_word_count,
         )
 
         return md
@@ -430,10 +1089,9 @@ class CldfDataset(CldfDatasetBase):
             'http://glottolog.org/resource/languoid/id/{Language_ID}'
         self.metadata['tables'].append(Cognates.table)
         macroareas = set()
-        for row in self.rows:
-            if row['Language_ID'] in self.dataset.glottolog_languoids:
-                for ma in self.dataset.glottolog_languoids[row['Language_ID']].macroareas:
-                    macroareas.add(ma)
+        for lid in set(row['Language_ID'] for row in self.rows):
+            if self.dataset.glottolog is not None and lid in self.dataset.glottolog:
+                macroareas.update(self.dataset.glottolog.macroareas(lid))
         stats = {
             'dc:title': 'stats',
             'properties': {
@@ -453,6 +1111,23 @@ class CldfDataset(CldfDatasetBase):
             }
         })
         super(CldfDataset, self).write(**kw)
+        self.update_catalog(**kw)
+
+    def update_catalog(self, outdir='.', suffix='.csv', **kw):
+        from pylexibank.catalog import Catalog, summary
+
+        md_path = Path(outdir).joinpath(
+            self.filename(Path(self.name + suffix), 'metadata'))
+        if md_path.exists():
+            catalog = Catalog.from_dataset(self.dataset)
+            try:
+                catalog.update(
+                    self.dataset,
+                    md_path,
+                    self.name,
+                    summary(self, {n['dc:title']: n['properties'] for n in self.table['notes']}))
+            finally:
+                catalog.close()
 
 
 class Unmapped(object):
@@ -0,0 +1,84 @@
+# coding: utf8
+"""
+Fingerprints of the inputs of a dataset's `cldf` command.
+
+A fingerprint maps the names of all inputs which determine the CLDF output of a dataset
+to checksums (or version strings). Comparing the fingerprint of the current inputs with
+the one stored with the last successful build tells us whether - and why - a dataset
+must be rebuilt. Since the CLDF output also depends on the shared code in pylexibank -
+providers, CLDF writing, segmentation, cognate detection and alignment - the fingerprint
+includes a checksum of the package sources and the versions of lingpy and pyclpa.
+"""
+from __future__ import unicode_literals, print_function, division
+import hashlib
+
+from clldutils import jsonlib
+from clldutils.path import Path, md5
+
+import pylexibank
+from pylexibank.util import text
+
+FNAME = 'fingerprint.json'
+METADATA = ['languages.csv', 'concepts.csv', 'metadata.json']
+_PACKAGE_CHECKSUM = []
+
+
+def package_checksum():
+    """
+    :return: MD5 checksum of the source files of the pylexibank package, excluding tests.
+    """
+    if not _PACKAGE_CHECKSUM:
+        pkg = Path(pylexibank.__file__).parent
+        checksum = hashlib.md5()
+        for p in sorted(pkg.glob('**/*.py'), key=lambda p: p.as_posix()):
+            rel = p.relative_to(pkg).as_posix()
+            if not rel.startswith('tests/'):
+                checksum.update(rel.encode('utf8'))
+                with p.open('rb') as fp:
+                    checksum.update(fp.read())
+        _PACKAGE_CHECKSUM.append(checksum.hexdigest())
+    return _PACKAGE_CHECKSUM[0]
+
+
+class Fingerprint(dict):
+    @classmethod
+    def from_dataset(cls, dataset, glottolog_version=None, concepticon_version=None):
+        res = cls()
+        # Since the raw data is validated against the bagit manifests before running
+        # `cldf`, the checksums of the manifests cover all files in `raw/data`:
+        for p in sorted(dataset.raw.parent.glob('manifest-*.txt'), key=lambda p: p.name):
+            res['raw/' + p.name] = md5(p)
+        # The dataset's python module, including helper modules:
+        for p in sorted(dataset.dir.glob('*.py'), key=lambda p: p.name):
+            res[p.name] = md5(p)
+        for name in METADATA:
+            p = dataset.dir.joinpath(name)
+            res[name] = md5(p) if p.exists() else None
+        from pylexibank.lingpy_util import VERSIONS
+
+        res['pylexibank'] = package_checksum()
+        res['lingpy'] = VERSIONS
+        res['glottolog'] = text(glottolog_version)
+        res['concepticon'] = text(concepticon_version)
+        return res
+
+    @classmethod
+    def load(cls, dataset):
+        """
+        :return: The fingerprint stored with the last successful build or `None`.
+        """
+        path = dataset.cldf_dir.joinpath(FNAME)
+        if path.exists():
+            try:
+                return cls(jsonlib.load(path))
+            except ValueError:  # pragma: no cover
+                pass
+
+    def save(self, dataset):
+        jsonlib.dump(self, dataset.cldf_dir.joinpath(FNAME), indent=4, sort_keys=True)
+
+    def diff(self, other):
+        """
+        :return: sorted `list` of names of inputs which differ between two fingerprints.
+        """
+        return sorted(k for k in set(self).union(other) if self.get(k) != other.get(k))
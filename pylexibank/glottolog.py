@@ -0,0 +1,162 @@
+# coding: utf8
+"""
+A compact index of the Glottolog languoid data used in lexibank.
+
+Loading all `pyglottolog.languoids.Languoid` objects is expensive, but we only need a few
+of their properties. So we store these properties as columnar numpy arrays in the lexibank
+cache directory - in a directory named after the `git describe` of the Glottolog
+repository, thus the index is rebuilt whenever the repository changes - and load them via
+memory-mapping.
+"""
+from __future__ import unicode_literals, print_function, division
+import os
+import tempfile
+
+import numpy as np
+from clldutils import jsonlib
+from clldutils.misc import cached_property
+from clldutils.path import git_describe, Path, rmtree, move
+
+from pylexibank import cache
+from pylexibank.util import text
+
+MD = 'index.json'
+COLUMNS = ['id', 'iso', 'macroareas', 'name_offsets', 'names', 'lineage_offsets', 'lineage']
+
+
+def _concat(items, dtype):
+    """
+    Store a list of variable length items as offsets and concatenated values.
+    """
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(i) for i in items])
+    values = np.fromiter(
+        (v for item in items for v in item), dtype=dtype, count=int(offsets[-1]))
+    return offsets, values
+
+
+class GlottologIndex(object):
+    """
+    Read-only access to Glottocode, ISO code, name, macroareas and lineage of languoids.
+    """
+    def __init__(self, path):
+        self.dir = Path(path)
+        md = jsonlib.load(self.dir.joinpath(MD))
+        self.version = md['version']
+        self.macroarea_names = md['macroareas']
+        for col in COLUMNS:
+            setattr(self, '_' + col, np.load(
+                self.dir.joinpath(col + '.npy').as_posix(), mmap_mode='r'))
+
+    @classmethod
+    def from_repos(cls, repos, cache_dir=None, version=None):
+        """
+        Load the index for a Glottolog repository, building it if necessary.
+        """
+        version = version or text(git_describe(repos))
+        cache_dir = Path(cache_dir or cache.DIR).joinpath('glottolog')
+        path = cache_dir.joinpath(version.replace(os.sep, '_'))
+        if not path.joinpath(MD).exists():
+            from pyglottolog.api import Glottolog
+
+            if not cache_dir.exists():
+                cache_dir.mkdir(parents=True)
+            tmp = Path(tempfile.mkdtemp(dir=cache_dir.as_posix()))
+            try:
+                cls.build(Glottolog(repos).languoids(), tmp, version)
+            except:  # pragma: no cover
+                rmtree(tmp)
+                raise
+            for p in cache_dir.iterdir():
+                if p.is_dir() and p != tmp:
+                    rmtree(p)  # Remove indexes of other Glottolog versions.
+            move(tmp, path)
+        return cls(path)
+
+    @staticmethod
+    def build(languoids, path, version):
+        """
+        Write the index data for an iterable of `Languoid` objects to directory `path`.
+        """
+        rows = sorted(
+            (l.id, l.iso_code or '', l.name, ['{0}'.format(ma) for ma in l.macroareas],
+             [gc for _, gc, _ in l.lineage]) for l in languoids)
+        macroareas = sorted(set(ma for row in rows for ma in row[3]))
+        index = {row[0]: i for i, row in enumerate(rows)}
+        names = [row[2].encode('utf8') for row in rows]
+        cols = dict(
+            id=np.array([row[0] for row in rows], dtype='U8'),
+            iso=np.array([row[1] for row in rows], dtype='U3'),
+            macroareas=np.array(
+                [sum(1 << macroareas.index(ma) for ma in row[3]) for row in rows],
+                dtype=np.uint16),
+        )
+        cols['name_offsets'], cols['names'] = _concat(
+            [bytearray(n) for n in names], np.uint8)
+        cols['lineage_offsets'], cols['lineage'] = _concat(
+            [[index[gc] for gc in row[4] if gc in index] for row in rows], np.int32)
+        for col in COLUMNS:
+            np.save(path.joinpath(col + '.npy').as_posix(), cols[col])
+        # The metadata is written last, marking the index as complete:
+        jsonlib.dump(dict(version=version, macroareas=macroareas), path.joinpath(MD))
+
+    def __len__(self):
+        return len(self._id)
+
+    def __contains__(self, glottocode):
+        return self._index(glottocode) is not None
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    @cached_property()
+    def ids(self):
+        return [text(gc) for gc in self._id.tolist()]
+
+    @cached_property()
+    def iso2glottocode(self):
+        return {
+            text(iso): text(gc) for gc, iso in zip(self._id.tolist(), self._iso.tolist())
+            if iso}
+
+    def _index(self, glottocode):
+        if glottocode:
+            i = int(np.searchsorted(self._id, glottocode))
+            if i < len(self._id) and self._id[i] == glottocode:
+                return i
+
+    def _get_index(self, glottocode):
+        i = self._index(glottocode)
+        if i is None:
+            raise KeyError(glottocode)
+        return i
+
+    def iso(self, glottocode):
+        return text(self._iso[self._get_index(glottocode)]) or None
+
+    def name(self, glottocode):
+        return self._name(self._get_index(glottocode))
+
+    def _name(self, i):
+        start, end = self._name_offsets[i], self._name_offsets[i + 1]
+        return bytes(bytearray(self._names[start:end])).decode('utf8')
+
+    def macroareas(self, glottocode):
+        mask = int(self._macroareas[self._get_index(glottocode)])
+        return [ma for i, ma in enumerate(self.macroarea_names) if mask & (1 << i)]
+
+    def lineage(self, glottocode):
+        """
+        :return: `list` of Glottocodes of the ancestors of a languoid, top-level first.
+        """
+        i = self._get_index(glottocode)
+        start, end = self._lineage_offsets[i], self._lineage_offsets[i + 1]
+        return [text(self._id[j]) for j in self._lineage[start:end]]
+
+    def family(self, glottocode):
+        """
+        :return: Name of the top-level family of a languoid or `''` for isolates.
+        """
+        i = self._get_index(glottocode)
+        start, end = self._lineage_offsets[i], self._lineage_offsets[i + 1]
+        return self._name(int(self._lineage[start])) if end > start else ''
@@ -0,0 +1,206 @@
+# coding: utf8
+"""
+A local SQLite database of the lexemes of all lexibank datasets.
+
+Cross-dataset analyses like `lexibank coverage` or `lexibank word_length` would otherwise
+have to load the CLDF data of all datasets. So `lexibank index` loads the relevant columns
+of all CLDF wordlists - and the cognate set IDs of the cognates tables - into the database
+`lexemes.sqlite` in the datasets directory, where they can be queried via indexes on
+Language_ID, Parameter_ID, variety and dataset.
+
+The database is updated incrementally: The MD5 checksum of each CSV file is recorded, and
+only the rows of CSV files which were added, changed or removed are replaced.
+"""
+from __future__ import unicode_literals, print_function, division
+import os
+import sqlite3
+from collections import defaultdict
+
+from clldutils.path import Path, md5
+from pycldf.dataset import MD_SUFFIX
+
+from pylexibank.dataset import CldfDatasetBase, Cognates, get_variety_id
+from pylexibank.wordlength import WordLengths
+
+FNAME = 'lexemes.sqlite'
+COLUMNS = ['ID', 'Language_ID', 'Parameter_ID', 'Value', 'Segments']
+INDEXES = ['Language_ID', 'Parameter_ID', 'variety', 'dataset']
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS file (
+    dataset TEXT, fname TEXT, md5 TEXT, PRIMARY KEY (dataset, fname));
+CREATE TABLE IF NOT EXISTS lexeme (
+    dataset TEXT, fname TEXT, row INTEGER, variety TEXT, %s);
+CREATE TABLE IF NOT EXISTS cognate (
+    dataset TEXT, fname TEXT, Wordlist_ID TEXT, Word_ID TEXT, Cognate_set_ID TEXT);
+CREATE INDEX IF NOT EXISTS cognate_set ON cognate (Cognate_set_ID);
+CREATE INDEX IF NOT EXISTS lexeme_word ON lexeme (dataset, fname, ID);
+%s""" % (
+    ', '.join('%s TEXT' % col for col in COLUMNS),
+    '\n'.join(
+        'CREATE INDEX IF NOT EXISTS lexeme_{0} ON lexeme ({0});'.format(col)
+        for col in INDEXES))
+
+
+def _iter_files(dataset):
+    """
+    :return: Generator of triples (CSV path, reader, table) for the CLDF data of a dataset.
+    """
+    for p in dataset.iter_cldf_metadata_paths():
+        yield p.parent.joinpath(p.name[:-len(MD_SUFFIX)]), _iter_lexemes(p), 'lexeme'
+    cognates = dataset.cldf_dir.joinpath(Cognates.table['url'])
+    if cognates.exists():
+        yield cognates, _iter_cognates(cognates), 'cognate'
+
+
+def _iter_lexemes(md_path):
+    for i, row in enumerate(CldfDatasetBase.from_metadata(md_path).rows):
+        yield [i, get_variety_id(row)] + [row.get(col) for col in COLUMNS]
+
+
+def _iter_cognates(path):
+    for row in Cognates().read(path.parent):
+        yield [row['Wordlist_ID'], row['Word_ID'], row['Cognate_set_ID']]
+
+
+class LexemeStore(object):
+    def __init__(self, path):
+        self.path = Path(path)
+        self._db, self._pid = None, None
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        """
+        :return: The lexeme store of the datasets directory containing `dataset`.
+        """
+        return cls(dataset.dir.parent.joinpath(FNAME))
+
+    @property
+    def db(self):
+        # SQLite connections must not be shared across forked processes.
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path.as_posix(), timeout=60)
+            self._db.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def update(self, dataset):
+        """
+        Update the rows of a dataset from the CSV files which changed since the last update.
+
+        :param dataset: `pylexibank.dataset.DatasetInfo` instance.
+        :return: `list` of names of the CSV files which were (re-)loaded or removed.
+        """
+        indexed = dict(self.db.execute(
+            'SELECT fname, md5 FROM file WHERE dataset = ?', (dataset.id,)))
+        changed = []
+        with self.db:
+            for path, rows, table in _iter_files(dataset):
+                checksum = md5(path) if path.exists() else None
+                if indexed.pop(path.name, None) == checksum:
+                    continue
+                self._delete(dataset.id, path.name)
+                if table == 'lexeme':
+                    cols = ['row', 'variety'] + COLUMNS
+                else:
+                    cols = ['Wordlist_ID', 'Word_ID', 'Cognate_set_ID']
+                self.db.executemany(
+                    'INSERT INTO %s (dataset, fname, %s) VALUES (?, ?, %s)' % (
+                        table, ', '.join(cols), ', '.join('?' for _ in cols)),
+                    ([dataset.id, path.name] + row for row in rows))
+                self.db.execute(
+                    'INSERT INTO file (dataset, fname, md5) VALUES (?, ?, ?)',
+                    (dataset.id, path.name, checksum))
+                changed.append(path.name)
+            for fname in indexed:
+                self._delete(dataset.id, fname)
+                changed.append(fname)
+        return changed
+
+    def prune(self, datasets):
+        """
+        Remove the rows of all datasets which are not in `datasets`.
+
+        :param datasets: Iterable of the IDs of the datasets to keep.
+        """
+        datasets = set(datasets)
+        with self.db:
+            for (dataset,) in self.db.execute('SELECT DISTINCT dataset FROM file').fetchall():
+                if dataset not in datasets:
+                    for table in ['file', 'lexeme', 'cognate']:
+                        self.db.execute(
+                            'DELETE FROM %s WHERE dataset = ?' % table, (dataset,))
+
+    def _delete(self, dataset, fname):
+        for table in ['file', 'lexeme', 'cognate']:
+            self.db.execute(
+                'DELETE FROM %s WHERE dataset = ? AND fname = ?' % table, (dataset, fname))
+
+    def _query(self, sql, dataset=None, order_by=None):
+        params = []
+        if dataset:
+            sql += (' AND' if ' WHERE ' in sql else ' WHERE') + ' dataset = ?'
+            params.append(dataset)
+        if order_by:
+            sql += ' ORDER BY ' + order_by
+        return self.db.execute(sql, params)
+
+    def files(self, dataset=None):
+        """
+        :param dataset: Optional dataset ID to restrict the query to.
+        :return: `list` of triples (dataset ID, CSV file name, MD5 checksum) of the loaded \
+        files.
+        """
+        return [list(row) for row in self._query(
+            "SELECT dataset, fname, md5 FROM file",
+            dataset=dataset,
+            order_by='dataset, fname')]
+
+    def coverage(self, dataset=None):
+        """
+        :param dataset: Optional dataset ID to restrict the query to.
+        :return: `dict` mapping variety IDs to `set`s of Concepticon IDs.
+        """
+        res = defaultdict(set)
+        for variety, pid in self._query(
+                "SELECT DISTINCT variety, Parameter_ID FROM lexeme "
+                "WHERE Parameter_ID != ''",
+                dataset=dataset):
+            res[variety].add(int(pid))
+        return dict(res)
+
+    def word_length(self, dataset=None):
+        """
+        :param dataset: Optional dataset ID to restrict the query to.
+        :return: `pylexibank.wordlength.WordLengths` aggregating the forms in the order of \
+        the CLDF data.
+        """
+        return WordLengths().add(self._query(
+            "SELECT Parameter_ID, Language_ID, variety, Segments FROM lexeme "
+            "WHERE Parameter_ID != '' AND Language_ID != '' AND Segments != ''",
+            dataset=dataset,
+            order_by='dataset, fname, row'))
+
+    def cognatesets(self, dataset=None):
+        """
+        :param dataset: Optional dataset ID to restrict the query to.
+        :return: `dict` mapping pairs (dataset ID, cognate set ID) to `list`s of pairs \
+        (variety ID, segmented form).
+        """
+        sql = """\
+SELECT c.dataset, c.Cognate_set_ID, l.variety, l.Segments
+FROM cognate AS c JOIN lexeme AS l
+ON c.dataset = l.dataset AND c.Wordlist_ID || '.csv' = l.fname AND c.Word_ID = l.ID"""
+        params = []
+        if dataset:
+            sql += ' WHERE c.dataset = ?'
+            params.append(dataset)
+        res = defaultdict(list)
+        for ds, csid, variety, segments in self.db.execute(
+                sql + ' ORDER BY l.dataset, l.fname, l.row', params):
+            res[(ds, csid)].append((variety, segments))
+        return dict(res)
@@ -1,16 +1,40 @@
 # coding=utf-8
-from __future__ import unicode_literals, print_function
+from __future__ import unicode_literals, print_function, division
+import os
+import json
+import pickle
+import sqlite3
+import tempfile
+import random
+import hashlib
+from itertools import product
 from collections import defaultdict, Counter
 
+import numpy as np
+from six import text_type
 from clldutils.misc import slug
+from clldutils.path import Path, move
 from six.moves.urllib.request import urlopen
-from lingpy.sequence.sound_classes import clean_string, tokens2class
+from lingpy.sequence.sound_classes import (
+    clean_string, tokens2class, token2class, prosodic_string, prosodic_weights)
+from lingpy.sequence.generate import MCPhon
 import lingpy as lp
+from lingpy.algorithm import calign, misc
+from lingpy.util import charstring, multicombinations2
+from lingpy.align.sca import SCA
+from lingpy.settings import rcParams
+import pyclpa
 from pyclpa.base import get_clpa
 from pybtex import database
 
+from pylexibank import cache
+from pylexibank.memo import Memo
+from pylexibank.util import pool
 
-clpa = get_clpa()
+
+# Results of `test_sequence` depend on the versions of lingpy and pyclpa:
+VERSIONS = 'lingpy-%s pyclpa-%s' % (lp.__version__, getattr(pyclpa, '__version__', ''))
+test_sequence_memo = Memo('test_sequence')
 
 
 def getEvoBibAsSource(key):
@@ -38,10 +62,113 @@ def getSourceFromBibTex(source):
     return database.parse_string(source, bib_format="bibtex")
 
 
-def test_sequence(sequence, **keywords):
+def test_sequence(sequence, table=None, **keywords):
     """
     Test a sequence for compatibility with CLPA and LingPy.
+
+    Results are memoized in `test_sequence_memo`.
+
+    :param table: `SegmentTable` used to classify the segments of the sequence.
     """
+    key = json.dumps([VERSIONS, sequence, keywords], sort_keys=True, default=repr)
+    try:
+        res = test_sequence_memo[key]
+    except KeyError:
+        res = _test_sequence(sequence, table=table, **keywords)
+        res = [
+            res[0],
+            res[1],
+            dict(res[2]),
+            dict(res[3]),
+            sorted(res[4]),
+            sorted(res[5]),
+            {k: sorted(v) for k, v in res[6].items()},
+            res[7]]
+        test_sequence_memo[key] = res
+    return (
+        list(res[0]),
+        list(res[1]),
+        Counter(res[2]),
+        Counter(res[3]),
+        set(res[4]),
+        set(res[5]),
+        defaultdict(set, [(k, set(v)) for k, v in res[6].items()]),
+        res[7])
+
+
+class SegmentTable(object):
+    """
+    Classification of the distinct segments of a dataset.
+
+    Since the number of distinct segments is small compared to the number of tokens, we
+    classify each segment only once - computing its Dolgopolsky sound class, CLPA
+    conversion and CLPA ID, with accents stripped where appropriate - and store the
+    results in dense columns, indexed by segment number.
+    """
+    def __init__(self, segments=None):
+        self._index = {}
+        self.dolgo, self.clpa, self.clpa_id, self.stripped, self.clpa_stripped = \
+            [], [], [], [], []
+        if segments:
+            self.add(segments)
+
+    @classmethod
+    def from_dataset(cls, dataset, column='Segments'):
+        """
+        Create a table for the segments found in a column of segmented strings.
+        """
+        res = cls()
+        res.add_dataset(dataset, column=column)
+        return res
+
+    def add_dataset(self, dataset, column='Segments'):
+        self.add(set(s for row in dataset.rows for s in (row[column] or '').split(' ')))
+
+    def __len__(self):
+        return len(self.dolgo)
+
+    def __contains__(self, segment):
+        return segment in self._index
+
+    def add(self, segments):
+        """
+        Classify the segments which are not yet in the table.
+        """
+        clpa = get_clpa()
+        for segment in segments:
+            if segment not in self._index:
+                try:
+                    dolgo = token2class(segment, 'dolgo')
+                    converted = clpa.check_sequence([segment])[0][0]
+                except (ValueError, IndexError, AttributeError):
+                    # Sequences containing such a segment are invalid.
+                    self._index[segment] = None
+                    continue
+                self._index[segment] = len(self.dolgo)
+                self.dolgo.append(dolgo)
+                self.clpa.append(converted)
+                self.clpa_id.append(clpa.segment2clpa(converted))
+                self.stripped.append(
+                    segment[1:] if segment[0] in clpa.accents else segment)
+                self.clpa_stripped.append(
+                    converted[1:] if converted[0] in clpa.accents else converted)
+
+    def lookup(self, segments):
+        """
+        :return: `list` of row numbers of `segments` in the table or `None` if one of the \
+        segments is invalid.
+        """
+        self.add(segments)
+        res = [self._index[s] for s in segments]
+        return None if None in res else res
+
+
+# The table used by `test_sequence` if no table is passed explicitly:
+_TABLE = SegmentTable()
+
+
+def _test_sequence(sequence, table=None, **keywords):
+    table = table if table is not None else _TABLE
     invalid = Counter()
     segment_count = Counter()
     lingpy_errors = set()
@@ -52,35 +179,31 @@ def test_sequence(sequence, **keywords):
     # clean the string at first, we only take the first item, ignore the rest
     try:
         segments = clean_string(sequence, **keywords)[0].split(' ')
+        rows = table.lookup(segments)
+        if rows is None or all(table.dolgo[i] == '0' for i in rows):
+            raise ValueError(sequence)
         lingpy_analysis = [
-            x if y != '0' else '?' for x, y in
-            zip(segments, tokens2class(segments, 'dolgo'))]
-        clpa_analysis, _sounds, _errors = clpa.check_sequence(segments)
-        general_errors = len(['?' for x in zip(
-            lingpy_analysis,
-            clpa_analysis) if '?' in x])
+            x if table.dolgo[i] != '0' else '?' for x, i in zip(segments, rows)]
+        general_errors = len([
+            x for x, i in zip(lingpy_analysis, rows) if x == '?' or table.clpa[i] == '?'])
     except (ValueError, IndexError, AttributeError):
         invalid.update([sequence])
-        segments, clpa_analysis = [], []
-
-    if segments:
-        for a, b, c in zip(segments, lingpy_analysis, clpa_analysis):
-            if a[0] in clpa.accents:
-                a = a[1:]
-            if c[0] in clpa.accents:
-                c = c[1:]
-            segment_count.update([a])
-            if b == '?':
-                lingpy_errors.add(a)
-            if c != a:
-                if c == '?':
-                    clpa_errors.add(a)
-                else:
-                    clpa_repl[a].add(c)
-    
+        segments, rows, lingpy_analysis = [], [], []
+
+    for b, i in zip(lingpy_analysis, rows):
+        a, c = table.stripped[i], table.clpa_stripped[i]
+        segment_count.update([a])
+        if b == '?':
+            lingpy_errors.add(a)
+        if c != a:
+            if c == '?':
+                clpa_errors.add(a)
+            else:
+                clpa_repl[a].add(c)
+
     return (
         segments,
-        [clpa.segment2clpa(x) for x in clpa_analysis],
+        [table.clpa_id[i] for i in rows],
         invalid,
         segment_count,
         lingpy_errors,
@@ -89,21 +212,31 @@ def test_sequence(sequence, **keywords):
         general_errors)
 
 
-def segmentize(dataset, source='Value', target='Segments', clean=lambda s: s, **kw):
+def segmentize(
+        dataset, source='Value', target='Segments', clean=lambda s: s, table=None, **kw):
     """
     Write a detailed transcription-report for a CLDF dataset in LexiBank.
+
+    :param table: `SegmentTable` instance, e.g. shared between datasets.
     """
+    table = table if table is not None else SegmentTable()
     for row in dataset.rows:
-        res = test_sequence(clean(row[source]), segmentized=False, **kw)
+        res = test_sequence(clean(row[source]), segmentized=False, table=table, **kw)
         row[target] = ' '.join(res[0])
 
 
-def test_sequences(dataset, lid_getter, report, column='Value', **kw):
+def test_sequences(dataset, lid_getter, report, column='Value', table=None, **kw):
     """
     Write a detailed transcription-report for a CLDF dataset in LexiBank.
+
+    :param table: `SegmentTable` instance, e.g. shared between datasets.
     """
+    table = table if table is not None else SegmentTable()
+    if kw.get('segmentized'):
+        # Classify the segments of the whole dataset in one go:
+        table.add_dataset(dataset, column=column)
     for i, row in enumerate(dataset.rows):
-        res = test_sequence(row[column], **kw)
+        res = test_sequence(row[column], table=table, **kw)
         if not kw['segmentized'] and column != 'Segments' and 'Segments' in row:
             row['Segments'] = ' '.join(res[0])
         lr = report[lid_getter(row)]
@@ -118,66 +251,536 @@ def test_sequences(dataset, lid_getter, report, column='Value', **kw):
             yield row
 
 
-def _cldf2wld(dataset):
-    """Make lingpy-compatible dictinary out of cldf main data."""
-    header = [h for h in dataset.rows[0].keys() if h != 'ID']
-    D = {0: ['lid'] + [h.lower() for h in header]}
-    for idx, row in enumerate(dataset.rows):
-        D[idx + 1] = [row['ID']] + [row[h] for h in header]
+# CLDF columns copied into lingpy wordlists (besides the segments), with the names of the
+# corresponding lingpy columns and whether values are repeated across many words:
+WORDLIST_COLUMNS = [
+    ('ID', 'lid', False),
+    ('Language_name', 'language_name', True),
+    ('Parameter_name', 'parameter_name', True),
+    ('Value', 'value', False),
+]
+
+
+def iter_cldf_datasets(dataset):
+    """
+    :param dataset: A CLDF dataset, an iterable of CLDF datasets or a \
+    `pylexibank.dataset.Dataset`.
+    :return: Iterable of CLDF datasets.
+    """
+    if hasattr(dataset, 'iter_cldf_datasets'):
+        return dataset.iter_cldf_datasets()
+    if hasattr(dataset, 'rows'):
+        return [dataset]
+    return dataset
+
+
+def _cldf2wld(dataset, column='Segments'):
+    """
+    Make lingpy-compatible dictionary out of cldf main data.
+
+    Only the columns needed for the analyses are copied - and values are not copied but
+    referenced, with one string object shared by all occurrences of the same language or
+    concept name.
+
+    :param dataset: see `iter_cldf_datasets`; words of multiple CLDF datasets are read one \
+    dataset at a time.
+    :param column: Name of the column holding the segments.
+    """
+    D = {0: [name for _, name, _ in WORDLIST_COLUMNS] + [column.lower(), 'cldf_dataset']}
+    strings = {}
+    for ds in iter_cldf_datasets(dataset):
+        for row in ds.rows:
+            D[len(D)] = [
+                strings.setdefault(row.get(col), row.get(col)) if shared else row.get(col)
+                for col, _, shared in WORDLIST_COLUMNS] + [row.get(column), ds.name]
     return D
 
 
 def _cldf2lexstat(
         dataset,
-        segments='segments',
+        segments='Segments',
         transcription='value',
         row='parameter_name',
         col='language_name'):
     """Read LexStat object from cldf dataset."""
-    D = _cldf2wld(dataset)
-    return lp.LexStat(D, segments=segments, transcription=transcription, row=row, col=col)
+    D = _cldf2wld(dataset, column=segments)
+    return lp.LexStat(D, segments=segments.lower(), transcription=transcription, row=row, col=col)
 
 
-def _cldf2wordlist(dataset, row='parameter_name', col='language_name'):
+def _cldf2wordlist(dataset, row='parameter_name', col='language_name', column='Segments'):
     """Read worldist object from cldf dataset."""
-    return lp.Wordlist(_cldf2wld(dataset), row=row, col=col)
+    return lp.Wordlist(_cldf2wld(dataset, column=column), row=row, col=col)
+
+
+# Versions of lingpy for which we checked that `get_scorer` computes the same scorer as
+# `lingpy.LexStat.get_scorer`, relying on the private methods and attributes of LexStat:
+SCORER_VERSIONS = ['2.6']
+# Maximal number of scorers kept in the cache, evicting the least recently used ones:
+LEXSTAT_CACHE_SIZE = 50
+# Configuration of the worker processes used by `get_scorer`:
+_LEXSTAT_WORKER = {}
+
+
+def _randist_pair(arg):
+    """
+    Compute the distribution of sound correspondences in randomly aligned words of a pair
+    of languages, like `lingpy.LexStat._get_randist` with `method='shuffle'`.
+    """
+    (i, tA), (j, tB) = arg
+    lex, kw = _LEXSTAT_WORKER['lex'], _LEXSTAT_WORKER['kw']
+    # Each pair of languages gets its own random number generator, so the results do not
+    # depend on the number of processes or the order in which the pairs are processed:
+    rnd = random.Random(kw['seed'] + i * lex.width + j)
+    corrdist = defaultdict(float)
+    numbers = [lex[pair, lex._numbers] for pair in lex.pairs[tA, tB]]
+    gops = [lex[pair, lex._weights] for pair in lex.pairs[tA, tB]]
+    prostrings = [lex[pair, lex._prostrings] for pair in lex.pairs[tA, tB]]
+    sample = [(x, y) for x in range(len(numbers)) for y in range(len(numbers))]
+    if len(sample) > kw['runs']:
+        sample = rnd.sample(sample, kw['runs'])
+
+    for mode, gop, scale in kw['modes']:
+        corrs, included = calign.corrdist(
+            10.0,
+            [(numbers[s[0]][0], numbers[s[1]][1]) for s in sample],
+            [(gops[s[0]][0], gops[s[1]][1]) for s in sample],
+            [(prostrings[s[0]][0], prostrings[s[1]][1]) for s in sample],
+            gop,
+            scale,
+            kw['factor'],
+            lex.bscorer,
+            mode,
+            kw['restricted_chars'])
+        for a, b in list(corrs.keys()):
+            d = corrs[a, b] * lex._included[tA, tB] / included
+            if a == '-':
+                a = charstring(i + 1)
+            elif b == '-':
+                b = charstring(j + 1)
+            corrdist[a, b] += d / len(kw['modes'])
+    return (tA, tB), corrdist
+
+
+def _markov_randist_pair(arg):
+    """
+    Compute the distribution of sound correspondences in aligned pairs of random words
+    of a pair of languages, like `lingpy.LexStat._get_randist` with `method='markov'`.
+    """
+    (i, tA), (j, tB) = arg
+    lex, kw = _LEXSTAT_WORKER['lex'], _LEXSTAT_WORKER['kw']
+    sample = _LEXSTAT_WORKER['sample']
+    (seqsA, weightsA, prosA), (seqsB, weightsB, prosB) = \
+        _LEXSTAT_WORKER['words'][tA], _LEXSTAT_WORKER['words'][tB]
+    corrdist = defaultdict(float)
+    for mode, gop, scale in kw['modes']:
+        corrs, included = calign.corrdist(
+            10.0,
+            [(seqsA[x], seqsB[y]) for x, y in sample],
+            [(weightsA[x], weightsB[y]) for x, y in sample],
+            [(prosA[x], prosB[y]) for x, y in sample],
+            gop,
+            scale,
+            kw['factor'],
+            lex.rscorer,
+            mode,
+            kw['restricted_chars'])
+        for a, b in list(corrs.keys()):
+            d = corrs[a, b] * lex._included[tA, tB] / included
+            if a == rcParams['gap_symbol']:
+                a = 'X.-'
+            elif b == rcParams['gap_symbol']:
+                b = 'X.-'
+            corrdist[str(i + 1) + '.' + a, str(j + 1) + '.' + b] += d / len(kw['modes'])
+    return (tA, tB), corrdist
+
+
+def _random_words(lex, i, taxon, kw):
+    """
+    Generate random words from a Markov chain trained on the words of a language, like
+    `lingpy.LexStat._get_randist` with `method='markov'` - but using a random number
+    generator seeded from `kw['seed']` rather than the global one.
+
+    :return: Triple (sound class sequences, prosodic weights, prosodic strings).
+    """
+    rnd = random.Random(kw['seed'] + i)
+    dist = MCPhon(
+        lex.get_list(col=taxon, entry='tokens', flat=True),
+        True,
+        lex.get_list(col=taxon, entry=lex._prostrings, flat=True)).dist
+    words, seen, duplicates = [], set(), 0
+    while len(words) < kw['rands']:
+        walk = [rnd.choice(dist['#'])]
+        while True:
+            segment = rnd.choice(dist[walk[-1]])
+            if segment == '$':
+                break
+            walk.append(segment)
+        word = ' '.join(s[1] for s in walk)
+        if word in seen:
+            duplicates += 1
+            if duplicates > kw['limit']:
+                break
+        else:
+            seen.add(word)
+            words.append(word)
+    while len(words) < kw['rands']:
+        words.append(words[rnd.randint(0, len(words) - 1)])
+
+    seqs, weights, pros = [], [], []
+    for word in words:
+        tokens = word.split(' ')
+        pros.append(prosodic_string(tokens))
+        weights.append(prosodic_weights(pros[-1]))
+        seqs.append([
+            '{0}.{1}'.format(c, lex._transform[p]) for c, p in zip(
+                tokens2class(tokens, lex.model, cldf=lex._cldf), pros[-1])])
+    return seqs, weights, pros
+
+
+def _get_randist(lex, processes, seed, **kw):
+    kw['seed'] = seed
+    if kw['method'] in ['markov', 'markov-chain', 'mc']:
+        # Random words are generated serially, their alignments are computed in parallel.
+        rnd = random.Random(seed)
+        _LEXSTAT_WORKER.update(
+            sample=rnd.sample(
+                [(i, j) for i in range(kw['rands']) for j in range(kw['rands'])],
+                kw['runs']),
+            words={
+                taxon: _random_words(lex, i, taxon, kw) for i, taxon in enumerate(lex.cols)})
+        worker = _markov_randist_pair
+    else:
+        worker = _randist_pair
+
+    _LEXSTAT_WORKER.update(lex=lex, kw=kw)
+    pairs = list(multicombinations2(enumerate(lex.cols)))
+    if processes > 1 and len(pairs) > 1:
+        p = pool(processes)
+        results = p.imap(worker, pairs, chunksize=max(1, len(pairs) // (processes * 4)))
+    else:
+        p, results = None, (worker(pair) for pair in pairs)
+    try:
+        return dict(results)
+    finally:
+        if p:
+            p.terminate()
+        _LEXSTAT_WORKER.clear()
+
+
+def _scorer_params(kw):
+    """
+    :return: Pair (`dict`, `str`) of the scorer parameters as recorded by \
+    `lingpy.LexStat.get_scorer`.
+    """
+    params = dict(
+        ratio=kw['ratio'],
+        vscale=kw['vscale'],
+        runs=kw['runs'],
+        scoring_threshold=kw['threshold'],
+        preprocessing_threshold=kw['preprocessing_threshold'],
+        modestring=':'.join(
+            '{0}-{1}-{2:.2f}'.format(a, abs(b), c) for a, b, c in kw['modes']),
+        factor=kw['factor'],
+        restricted_chars=kw['restricted_chars'],
+        method=kw['method'],
+        preprocessing='{0}:{1}:{2}'.format(
+            kw['preprocessing'], kw['cluster_method'], kw['gop']),
+        unattested=kw['unattested'],
+        unexpected=kw['unexpected'])
+    parstring = '_'.join([
+        '{ratio[0]}:{ratio[1]}',
+        '{vscale:.2f}',
+        '{runs}',
+        '{scoring_threshold:.2f}',
+        '{modestring}',
+        '{factor:.2f}',
+        '{restricted_chars}',
+        '{method}',
+        '{preprocessing}',
+        '{preprocessing_threshold}',
+        '{unexpected:.2f}',
+        '{unattested:.2f}']).format(**params)
+    return params, parstring
+
+
+def _scorer_matrix(lex, corrdist, randist, kw):
+    """
+    Combine attested and random distributions of sound correspondences into the scoring
+    matrix, like `lingpy.LexStat.get_scorer`.
+    """
+    gop = sum(m[1] for m in kw['modes']) / len(kw['modes'])
+    matrix = [[c for c in line] for line in lex.bscorer.matrix]
+    char_dict = lex.bscorer.chars2int
+
+    for (i, tA), (j, tB) in multicombinations2(enumerate(lex.cols)):
+        for charA, charB in product(
+                list(lex.freqs[tA]) + [charstring(i + 1)],
+                list(lex.freqs[tB]) + [charstring(j + 1)]):
+            exp = randist.get((tA, tB), {}).get((charA, charB), False)
+            att = corrdist.get((tA, tB), {}).get((charA, charB), False)
+            if att <= 1 and i != j:
+                att = False
+
+            if att and exp:
+                score = np.log2((att ** 2) / (exp ** 2))
+            elif att and not exp:
+                score = np.log2((att ** 2) / kw['unexpected'])
+            elif exp and not att:
+                score = kw['unattested']
+            else:
+                score = -90
+
+            if rcParams['gap_symbol'] not in charA + charB:
+                sim = lex.bscorer[charA, charB]
+            else:
+                sim = gop
+            rscore = (kw['ratio'][0] * score + kw['ratio'][1] * sim) / sum(kw['ratio'])
+
+            if charA in char_dict and charB in char_dict:
+                iA, iB = char_dict[charA], char_dict[charB]
+                if charA[4] in lex.vowels and charB[4] in lex.vowels:
+                    matrix[iA][iB] = matrix[iB][iA] = kw['vscale'] * rscore
+                else:
+                    matrix[iA][iB] = matrix[iB][iA] = rscore
+    return matrix
+
+
+def _prune_lexstat_cache(directory, size=LEXSTAT_CACHE_SIZE):
+    paths = sorted(
+        directory.glob('*.pickle'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in paths[size:]:
+        p.unlink()
+
+
+def get_scorer(lex, processes=1, seed=0, **keywords):
+    """
+    Compute the LexStat scoring function of a `lingpy.LexStat` object.
+
+    The random distribution of sound correspondences is computed in `processes` worker
+    processes with random number generators seeded from `seed`. For lingpy versions not
+    in `SCORER_VERSIONS` we fall back to `lingpy.LexStat.get_scorer`. The resulting scorer
+    is stored in the lexibank cache directory, keyed by a hash of the wordlist data and
+    the parameters, so computing the scorer again for identical input is cheap. Either
+    way, `lex` ends up with the same attributes as after `lingpy.LexStat.get_scorer`.
+    """
+    kw = lex.get_scorer(defaults=True, **keywords)
+    if hasattr(lex, 'cscorer') and not kw['force']:
+        # Like lingpy, we don't overwrite an existing scorer unless forced to.
+        return lex
+    key = hashlib.md5(json.dumps(
+        [lp.__version__, seed, kw, sorted(lex.header.items()), [lex[k] for k in sorted(lex)]],
+        sort_keys=True,
+        default=repr).encode('utf8')).hexdigest()
+    path = cache.DIR.joinpath('lexstat', key + '.pickle')
+    if path.exists():
+        with open(path.as_posix(), 'rb') as fp:
+            res = pickle.load(fp)
+        # Mark the scorer as recently used:
+        os.utime(path.as_posix(), None)
+    else:
+        if _known_version(SCORER_VERSIONS):
+            params, parstring = _scorer_params(kw)
+            res = dict(
+                params=params,
+                stamp='# Parameters: ' + parstring + '\n',
+                corrdist=lex._get_corrdist(**kw))
+            res['randist'] = _get_randist(lex, processes, seed, **kw)
+            res['matrix'] = _scorer_matrix(lex, res['corrdist'], res['randist'], kw)
+        else:
+            stamp = lex._stamp
+            lex.get_scorer(**keywords)
+            res = dict(
+                params=lex.params['cscorer'],
+                stamp=lex._stamp[len(stamp):],
+                corrdist=lex._corrdist,
+                randist=lex._randist,
+                matrix=lex.cscorer.matrix)
+            # The attributes are set below, just like for cached scorers:
+            lex._stamp = stamp
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent.as_posix(), delete=False) as fp:
+            pickle.dump(res, fp, protocol=2)
+        move(Path(fp.name), path)
+        _prune_lexstat_cache(path.parent)
+
+    lex.params = {'cscorer': res['params']}
+    lex._meta['params'] = lex.params
+    lex._stamp += res['stamp']
+    lex._corrdist, lex._randist = res['corrdist'], res['randist']
+    lex.cscorer = misc.ScoreDict(lex.chars, res['matrix'])
+    lex._meta['scorer']['cscorer'] = lex.cscorer
+    return lex
+
+
+# Configuration of the worker processes used by `iter_partitioned_cognates`:
+_PARTITION_WORKER = {}
+PARTITION_COLS = ['dataset', 'lid', 'language_name', 'parameter_name', 'value', 'segments']
+
+
+def _cluster_partition(parameter):
+    w = _PARTITION_WORKER
+    if w.get('pid') != os.getpid():
+        w.update(pid=os.getpid(), db=sqlite3.connect(w['path']))
+    D = {0: PARTITION_COLS}
+    for row in w['db'].execute(
+            'SELECT %s FROM words WHERE parameter = ? ORDER BY pk' % ', '.join(PARTITION_COLS),
+            (parameter,)):
+        D[len(D)] = list(row[:-1]) + [row[-1].split()]
+    lex = lp.LexStat(
+        D,
+        segments='segments',
+        transcription='value',
+        row='parameter_name',
+        col='language_name')
+    lex.cluster(method=w['method'], threshold=w['threshold'], ref='cogid')
+    return [[lex[k, col] for col in PARTITION_COLS[:-1]] + [lex[k, 'cogid']] for k in lex]
+
+
+def iter_partitioned_cognates(
+        datasets, column='Segments', method='sca', threshold=0.5, processes=1):
+    """
+    Compute cognates automatically, clustering the words for each concept separately.
+
+    Since cognate judgements are only made within a concept, the words of a (possibly
+    huge) dataset can be clustered one concept at a time, so memory use depends on the
+    number of words for the largest concept rather than on the size of the dataset.
+    The words are spooled to a temporary SQLite database, from which each of the
+    `processes` worker processes reads the partitions it clusters.
+
+    As for unpartitioned clustering, words are assigned to taxa by `Language_name`. Unlike
+    `lingpy.LexStat`, which fails on words with empty segments, such words are skipped.
+
+    :param datasets: Iterable of CLDF datasets, whose words are partitioned by \
+    `Parameter_ID`.
+    :return: Generator of cognate judgements with cognate set IDs unique across partitions.
+    """
+    if method != 'sca':
+        # The LexStat scorer is computed from sound correspondences across all concepts.
+        raise ValueError('partitioned clustering is only supported for method "sca"')
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    db = sqlite3.connect(path)
+    try:
+        db.execute('CREATE TABLE words (pk INTEGER PRIMARY KEY, parameter TEXT, %s)' % (
+            ', '.join('%s TEXT' % col for col in PARTITION_COLS)))
+        for ds in datasets:
+            db.executemany(
+                'INSERT INTO words (parameter, %s) VALUES (?, %s)' % (
+                    ', '.join(PARTITION_COLS), ', '.join('?' for _ in PARTITION_COLS)),
+                ([row['Parameter_ID'],
+                  ds.name,
+                  row['ID'],
+                  row['Language_name'],
+                  row['Parameter_name'],
+                  row['Value'],
+                  ' '.join(row[column]) if isinstance(row[column], list) else row[column]]
+                 for row in ds.rows if row[column]))
+        db.execute('CREATE INDEX words_parameter ON words (parameter, pk)')
+        db.commit()
+        parameters = [
+            r[0] for r in db.execute('SELECT DISTINCT parameter FROM words ORDER BY parameter')]
+
+        _PARTITION_WORKER.update(path=path, method=method, threshold=threshold)
+        if processes > 1 and len(parameters) > 1:
+            p = pool(processes)
+            results = p.imap(
+                _cluster_partition,
+                parameters,
+                chunksize=max(1, len(parameters) // (processes * 4)))
+        else:
+            p, results = None, (_cluster_partition(param) for param in parameters)
+        try:
+            offset = 0
+            for words in results:
+                # Cognate set IDs are local to a partition, so we renumber them:
+                cogids = {}
+                for dsname, lid, _, _, value, cogid in words:
+                    cogids.setdefault(cogid, offset + len(cogids) + 1)
+                    yield (
+                        lid,
+                        dsname,
+                        value,
+                        cogids[cogid],
+                        '',
+                        method + '-t{0:.2f}'.format(threshold),
+                        '',  # cognate source
+                        '',  # alignment
+                        '',  # alignment method
+                        '',  # alignment source
+                    )
+                offset += len(cogids)
+        finally:
+            if p:
+                p.terminate()
+            if _PARTITION_WORKER.get('db'):
+                _PARTITION_WORKER['db'].close()
+            _PARTITION_WORKER.clear()
+    finally:
+        db.close()
+        os.remove(path)
 
 
 def iter_cognates(
-        dataset, column='Segments', method='turchin', threshold=0.5, **keywords):
+        dataset,
+        column='Segments',
+        method='turchin',
+        threshold=0.5,
+        processes=1,
+        partitioned=False,
+        **keywords):
     """
     Compute cognates automatically for a given dataset.
+
+    :param dataset: A CLDF dataset, an iterable of CLDF datasets or a \
+    `pylexibank.dataset.Dataset`, in which case the words of all its CLDF datasets are \
+    clustered.
+    :param processes: Number of worker processes used to compute the LexStat scorer, or to \
+    cluster the partitions.
+    :param partitioned: If `True`, words are clustered separately for each concept, see \
+    `iter_partitioned_cognates`.
+    :param keywords: Keyword arguments passed into `get_scorer`.
     """
     if method == 'turchin':
-        for row in dataset.rows:
-            sounds = ''.join(tokens2class(row[column].split(' '), 'dolgo'))
-            if sounds.startswith('V'):
-                sounds = 'H' + sounds
-            sounds = '-'.join([s for s in sounds if s != 'V'][:2])
-            cogid = slug(row['Parameter_name'])+'-'+sounds
-            if '0' not in sounds:
-                yield (
-                    row['ID'],
-                    dataset.name,
-                    row['Value'],
-                    cogid,
-                    '',
-                    'CMM',
-                    '',  # cognate source
-                    '',  # alignment
-                    '',  # alignment method
-                    '',  # alignment source
-                )
-
-    if method in ['sca', 'lexstat']:
-        lex = _cldf2lexstat(dataset)
+        for ds in iter_cldf_datasets(dataset):
+            for row in ds.rows:
+                sounds = ''.join(tokens2class(row[column].split(' '), 'dolgo'))
+                if sounds.startswith('V'):
+                    sounds = 'H' + sounds
+                sounds = '-'.join([s for s in sounds if s != 'V'][:2])
+                cogid = slug(row['Parameter_name'])+'-'+sounds
+                if '0' not in sounds:
+                    yield (
+                        row['ID'],
+                        ds.name,
+                        row['Value'],
+                        cogid,
+                        '',
+                        'CMM',
+                        '',  # cognate source
+                        '',  # alignment
+                        '',  # alignment method
+                        '',  # alignment source
+                    )
+
+    elif partitioned:
+        for row in iter_partitioned_cognates(
+                iter_cldf_datasets(dataset),
+                column=column,
+                method=method,
+                threshold=threshold,
+                processes=processes):
+            yield row
+
+    elif method in ['sca', 'lexstat']:
+        lex = _cldf2lexstat(dataset, segments=column)
         if method == 'lexstat':
-            lex.get_scorer(**keywords)
+            get_scorer(lex, processes=processes, **keywords)
         lex.cluster(method=method, threshold=threshold, ref='cogid')
         for k in lex:
             yield (
                 lex[k, 'lid'],
-                dataset.name,
+                lex[k, 'cldf_dataset'],
                 lex[k, 'value'],
                 lex[k, 'cogid'],
                 '',
@@ -189,13 +792,104 @@ def iter_cognates(
             )
 
 
+# Alignments of cognate sets, keyed by a hash of the alignment parameters and the sequences:
+alignment_memo = Memo('alignment')
+# Configuration of the worker processes used by `align`:
+_ALIGN_WORKER = {}
+
+
+def _align_msa(arg):
+    key, msa = arg
+    kw = _ALIGN_WORKER['kw']
+    m = SCA(msa, **kw)
+    if kw['method'] == 'progressive':
+        m.prog_align(**kw)
+    else:
+        m.lib_align(**kw)
+    return key, m.alm_matrix
+
+
+def alignment_key(msa, **kw):
+    """
+    :return: Key of the alignment of a cognate set in `alignment_memo`.
+    """
+    params = [lp.__version__] + [
+        kw[k].name if k == 'model' else kw[k] for k in [
+            'method', 'model', 'mode', 'modes', 'gop', 'scale', 'factor', 'tree_calc',
+            'gap_weight', 'restricted_chars']]
+    return hashlib.md5(json.dumps(
+        [params, [' '.join(seq) for seq in msa['seqs']]],
+        default=repr).encode('utf8')).hexdigest()
+
+
+# Versions of lingpy for which we checked the behaviour of `Alignments._msa2col`:
+MSA2COL_VERSIONS = ['2.6']
+
+
+def _known_version(versions):
+    """
+    :param versions: `list` of lingpy versions given as "major.minor".
+    :return: Flag signaling whether the installed lingpy is one of `versions`.
+    """
+    return '.'.join(lp.__version__.split('.')[:2]) in versions
+
+
+def align(alm, method='library', processes=1):
+    """
+    Align the cognate sets of a `lingpy.Alignments` object.
+
+    Alignments are memoized in `alignment_memo`, so only new or changed cognate sets are
+    aligned. Since cognate sets are aligned independently of each other, they can be
+    distributed over `processes` worker processes. The results are identical to
+    `alm.align`.
+
+    Writing the memoized alignments to the wordlist relies on the private method
+    `lingpy.Alignments._msa2col`, so for lingpy versions not in `MSA2COL_VERSIONS` we
+    fall back to `alm.align`.
+    """
+    kw = alm.align(method=method, defaults=True)
+    if isinstance(kw['model'], text_type):
+        kw['model'] = rcParams[kw['model']]
+    if kw['scoredict'] or method not in ['library', 'progressive'] \
+            or not _known_version(MSA2COL_VERSIONS):
+        alm.align(method=method)
+        return alm
+
+    msas, keys, todo = alm.msa[kw['ref']], {}, []
+    for key in sorted(k for k in msas if k not in [0, '0', '']):
+        keys[key] = alignment_key(msas[key], **kw)
+        try:
+            msas[key]['alignment'] = [list(row) for row in alignment_memo[keys[key]]]
+        except KeyError:
+            todo.append((key, msas[key]))
+
+    _ALIGN_WORKER.update(kw=kw)
+    if processes > 1 and len(todo) > 1:
+        p = pool(processes)
+        results = p.imap(
+            _align_msa, todo, chunksize=max(1, len(todo) // (processes * 4)))
+    else:
+        p, results = None, (_align_msa(arg) for arg in todo)
+    try:
+        for key, alignment in results:
+            alignment_memo[keys[key]] = alignment
+            msas[key]['alignment'] = alignment
+    finally:
+        if p:
+            p.terminate()
+        _ALIGN_WORKER.clear()
+    # Write the alignments to the `alignment` column, just like `Alignments.align` does:
+    alm._msa2col(ref=kw['ref'], alignment=kw['alignment'])
+    return alm
+
+
 def iter_alignments(
-        dataset, cognate_sets, column='Segments', method='library', prefix=''):
+        dataset, cognate_sets, column='Segments', method='library', prefix='', processes=1):
     """
     Function computes automatic alignments and writes them to file.
     """
     if not isinstance(dataset, lp.basic.parser.QLCParser):
-        wordlist = _cldf2wordlist(dataset)
+        wordlist = _cldf2wordlist(dataset, column=column)
         cognates = {r[0]: r for r in cognate_sets}
         wordlist.add_entries(
             'cogid', 'lid', lambda x: cognates[x][3] if x in cognates else '')
@@ -208,7 +902,7 @@ def iter_alignments(
             row='parameter_name',
             col='language_name',
             segments=column.lower())
-        alm.align(method=method)
+        align(alm, method=method, processes=processes)
         for k in alm:
             if alm[k, 'lid'] in cognates:
                 row = list(cognates[alm[k, 'lid']])
@@ -217,7 +911,7 @@ def iter_alignments(
                 yield row
     else:
         alm = lp.Alignments(dataset, ref='cogid')
-        alm.align(method=method)
+        align(alm, method=method, processes=processes)
         for row in cognate_sets:
             try:
                 idx = int(row[0].split('-')[1])
@@ -0,0 +1,130 @@
+# coding: utf8
+"""
+Persistent memoization of expensive, deterministic computations.
+
+A `Memo` maps text keys to JSON serializable values. It keeps recently used items in an
+in-process LRU cache and stores all items in an SQLite database in the lexibank cache
+directory, which is shared between runs and datasets.
+"""
+from __future__ import unicode_literals, print_function, division
+import os
+import json
+import sqlite3
+from collections import OrderedDict, Counter
+
+from pylexibank import cache
+
+# All memos created in this process, keyed by name:
+MEMOS = OrderedDict()
+
+
+class Memo(object):
+    def __init__(self, name, maxsize=100000, path=None):
+        self.name = name
+        self.maxsize = maxsize
+        self._path = path
+        self._lru = OrderedDict()
+        self._pending = {}
+        self._db, self._pid = None, None
+        self.stats = Counter(hits=0, misses=0)
+        MEMOS[name] = self
+
+    @property
+    def path(self):
+        return self._path or cache.DIR.joinpath(self.name + '.sqlite')
+
+    @property
+    def db(self):
+        # SQLite connections must not be shared across forked processes.
+        if self._db is None or self._pid != os.getpid():
+            path = self.path
+            if not path.parent.exists():
+                path.parent.mkdir(parents=True)
+            self._db = sqlite3.connect(path.as_posix(), timeout=60)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, value TEXT)')
+            self._pid = os.getpid()
+        return self._db
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def __getitem__(self, key):
+        if key in self._lru:
+            value = self._lru.pop(key)
+            self._lru[key] = value
+            self.stats['hits'] += 1
+            return value
+        row = self.db.execute('SELECT value FROM memo WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            raise KeyError(key)
+        value = json.loads(row[0])
+        self._remember(key, value)
+        self.stats['hits'] += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._remember(key, value)
+        self._pending[key] = json.dumps(value)
+        if len(self._pending) >= 10000:
+            self.flush()
+
+    def flush(self):
+        """
+        Write new items to the database.
+        """
+        if self._pending:
+            with self.db:
+                self.db.executemany(
+                    'INSERT OR REPLACE INTO memo (key, value) VALUES (?, ?)',
+                    list(self._pending.items()))
+            self._pending = {}
+
+    def close(self):
+        """
+        Write new items to the database and close the connection.
+        """
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        self._lru = OrderedDict()
+
+
+def flush():
+    for memo in MEMOS.values():
+        memo.flush()
+
+
+def stats():
+    """
+    :return: `dict` mapping memo names to `Counter`s of hits and misses.
+    """
+    return {name: Counter(memo.stats) for name, memo in MEMOS.items()}
+
+
+def diff_stats(before):
+    """
+    :param before: Stats as returned by `stats`.
+    :return: `dict` mapping memo names to `Counter`s of hits and misses since `before`.
+    """
+    return {n: c - before.get(n, Counter()) for n, c in stats().items()}
+
+
+def add_stats(stats):
+    """
+    Add hits and misses counted in another process - e.g. a pool worker - to the memos of
+    this process.
+    """
+    for name, counts in stats.items():
+        if name in MEMOS:
+            MEMOS[name].stats.update(counts)
+
+
+def format_stats(stats):
+    return '; '.join(
+        '%s cache: %s hits, %s misses' % (name, c['hits'], c['misses'])
+        for name, c in sorted(stats.items()) if c['hits'] or c['misses'])
@@ -3,9 +3,8 @@ from __future__ import unicode_literals, print_function, division
 from xml.etree import cElementTree as et
 import re
 
-from six import text_type
-import requests
-from clldutils.misc import xmlchars, slug
+from six import text_type, PY2
+from clldutils.misc import xmlchars
 from pycldf.sources import Source
 
 from pylexibank.dataset import CldfDataset
@@ -13,45 +12,109 @@ from pylexibank import util
 from pylexibank.lingpy_util import segmentize
 
 URL = "http://language.psy.auckland.ac.nz/utils/save/?type=xml&section=%s&language=%d"
+# Page listing links to the languages of a section:
+INDEX_URL = "http://language.psy.auckland.ac.nz/%s/language.php"
+MAX_LANGUAGE_ID = 1500
 INVALID_LANGUAGE_IDS = {
     'austronesian': [261],  # Duplicate West Futuna list
 }
-
-
-def get_data(dataset, section, lid):
-    req = requests.get(URL % (section, lid))
-    if len(req.content) == 0:
-        return None
-
-    with dataset.raw.joinpath('%s.xml' % (lid)).open('w', encoding='utf8') as fp:
-        fp.write(req.text)
-    return True
-
-
-def download(dataset, section):
+# Normalized `__attr_map__` specs of `XmlElement` subclasses:
+_ATTR_SPECS = {}
+
+
+def language_ids(downloader, section):
+    """
+    :return: Pair (sorted `list` of language IDs, flag signaling whether the IDs were \
+    listed in the section's index). If the index is not available, all IDs up to \
+    `MAX_LANGUAGE_ID` are returned, since the numbering of languages has gaps.
+    """
+    try:
+        res = downloader.get(INDEX_URL % section, required=False)
+    except Exception as e:
+        downloader.log.warn('%s' % e)
+        res = None
+    ids = set()
+    if res is not None:
+        ids = set(int(i) for i in re.findall(r'language\.php\?id=([0-9]+)', res.text))
+    if ids:
+        return sorted(ids), True
+    return list(range(1, MAX_LANGUAGE_ID)), False
+
+
+def download(dataset, section, **kw):
+    """
+    Download the XML wordlists of the languages of a section to `raw/<id>.xml`.
+
+    :param kw: Keyword arguments are passed into `pylexibank.util.Downloader`.
+    """
     assert section in ['austronesian', 'bantu', 'mayan', 'utoaztecan']
     dataset.log.info(section)
-    language_ids = [
-        i for i in range(1, 1500) if i not in INVALID_LANGUAGE_IDS.get(section, [])]
-
-    for language_id in language_ids:
-        if not get_data(dataset, section, language_id):
-            dataset.log.warn("No content for %s %d. Ending." % (section, language_id))
-            break
-
+    downloader = util.Downloader(log=dataset.log, **kw)
+    ids, listed = language_ids(downloader, section)
+    if not listed:
+        dataset.log.warn('no language index for %s, trying all IDs' % section)
+    # If languages are listed, an empty wordlist is an error, otherwise it means the ID
+    # is not in use:
+    res = downloader.download(
+        [(URL % (section, i), dataset.raw.joinpath('%s.xml' % i))
+         for i in ids if i not in INVALID_LANGUAGE_IDS.get(section, [])],
+        required=listed,
+        decode=True)
+    dataset.log.info('%s: %s' % (section, ', '.join(
+        '%s %s' % (n, status) for status, n in sorted(res.items()))))
+    return res
+
+
+class _XmlStream(object):
+    """
+    File-like object reading an ABVD XML file - a sequence of `record` elements - wrapped
+    in a root element, with characters which are invalid in XML removed.
+    """
+    def __init__(self, path, size=2 ** 16):
+        self._chunks = self._iter_chunks(path, size)
 
-def read_xml(path):
-    with path.open(encoding='utf8') as fp:
-        return et.fromstring(xmlchars('<r>%s</r>' % fp.read()).encode('utf8'))
-
-
-class XmlElement(object):
-    __attr_map__ = []
-
-    def __init__(self, e):
-        self.id = '%s' % int(e.find('id').text)
-        self.e = e
-        for spec in self.__attr_map__:
+    @staticmethod
+    def _iter_chunks(path, size):
+        yield '<r>'
+        with path.open(encoding='utf8') as fp:
+            for chunk in iter(lambda: fp.read(size), ''):
+                yield xmlchars(chunk)
+        yield '</r>'
+
+    def read(self, size=-1):
+        for chunk in self._chunks:
+            if chunk:
+                return chunk.encode('utf8')
+        return b''
+
+
+def iter_records(path):
+    """
+    Parse an ABVD XML file incrementally, clearing elements once they are read.
+
+    :return: Generator of `dict`s mapping the tags of the children of a record to their text.
+    """
+    root = None
+    for event, e in et.iterparse(_XmlStream(path), events=('start', 'end')):
+        if root is None:
+            root = e
+        elif event == 'end' and e.tag == 'record':
+            record = {}
+            for child in e:
+                record.setdefault(child.tag, child.text)
+            yield record
+            # Clearing the root also removes the reference to the record we just read:
+            root.clear()
+
+
+def _attr_specs(cls):
+    """
+    :return: `list` of triples (tag, attribute name, converter) for the `__attr_map__` of \
+    an `XmlElement` subclass.
+    """
+    if cls not in _ATTR_SPECS:
+        specs = []
+        for spec in cls.__attr_map__:
             if len(spec) == 2:
                 attr, nattr = spec
                 conv = None
@@ -59,15 +122,25 @@ class XmlElement(object):
                 attr, nattr, conv = spec
             else:
                 raise ValueError(spec)
-            nattr = nattr or attr
-            ee = e.find(attr)
-            if ee is not None:
-                text = e.find(attr).text
-                if text and not isinstance(text, text_type):
-                    text = text.decode('utf8')
-            else:
-                text = ''
+            specs.append((attr, nattr or attr, conv))
+        _ATTR_SPECS[cls] = specs
+    return _ATTR_SPECS[cls]
+
+
+class XmlElement(object):
+    __slots__ = ['id']
+    __attr_map__ = []
+
+    def __init__(self, record):
+        """
+        :param record: `dict` as yielded by `iter_records`.
+        """
+        self.id = '%s' % int(record['id'])
+        for attr, nattr, conv in _attr_specs(type(self)):
+            text = record.get(attr)
             if text:
+                if PY2 and not isinstance(text, text_type):
+                    text = text.decode('utf8')
                 text = text.strip()
 
             if text and conv:
@@ -88,12 +161,14 @@ class Language(XmlElement):
         ('checkedby', ''),
     ]
 
-    def __init__(self, e):
-        XmlElement.__init__(self, e)
+    def __init__(self, record):
+        XmlElement.__init__(self, record)
         self.glottocode = None
 
 
 class Entry(XmlElement):
+    __slots__ = [
+        'section', 'word_id', 'word', 'name', 'comment', 'loan', 'cognacy', '_cognates']
     __attr_map__ = [
         ('word_id', '', lambda s: '%s' % int(s)),
         ('word', ''),
@@ -104,9 +179,10 @@ class Entry(XmlElement):
         #('pmpcognacy', ''),
     ]
 
-    def __init__(self, e, section):
+    def __init__(self, record, section):
         self.section = section
-        XmlElement.__init__(self, e)
+        self._cognates = None
+        XmlElement.__init__(self, record)
 
     @property
     def concept_id(self):
@@ -118,31 +194,31 @@ class Entry(XmlElement):
 
     @property
     def cognates(self):
-        res = set()
-        for comp in re.split(',|/', self.cognacy or ''):
-            comp = comp.strip().lower()
-            if comp:
-                doubt = False
-                if comp.endswith('?'):
-                    doubt = True
-                    comp = comp[:-1].strip()
-                res.add(('%s-%s' % (self.word_id, comp), doubt))
-        return res
+        if self._cognates is None:
+            res = set()
+            for comp in re.split(',|/', self.cognacy or ''):
+                comp = comp.strip().lower()
+                if comp:
+                    doubt = False
+                    if comp.endswith('?'):
+                        doubt = True
+                        comp = comp[:-1].strip()
+                    res.add(('%s-%s' % (self.word_id, comp), doubt))
+            self._cognates = res
+        return self._cognates
 
 
 class Wordlist(object):
     def __init__(self, dataset, path, section):
         self.dataset = dataset
-        e = read_xml(path)
         self.section = section
-        records = list(e.findall('./record'))
-        self.language = Language(records[0])
-        self.entries = [Entry(r, section) for r in records[1:] if self.is_entry(r)]
+        records = iter_records(path)
+        self.language = Language(next(records))
+        self.entries = [Entry(r, section) for r in records if self.is_entry(r)]
 
     @staticmethod
     def is_entry(r):
-        return getattr(r.find('id'), 'text', None) \
-            and getattr(r.find('item'), 'text', None)
+        return r.get('id') and r.get('item')
 
     def url(self, path):
         return 'http://language.psy.auckland.ac.nz/%s/%s' % (self.section, path)
@@ -160,7 +236,20 @@ class Wordlist(object):
             k: getattr(self.language, k, None)
             for k in 'id name author notes problems typedby checkedby'.split()})
 
-    def to_cldf(self, concept_map, unmapped, citekey=None, source=None, concept_key=None):
+    def to_cldf(self,
+                concept_map,
+                unmapped,
+                citekey=None,
+                source=None,
+                concept_key=None,
+                cognates=None):
+        """
+        Write the wordlist as CLDF dataset.
+
+        :param cognates: Optional list - e.g. `Dataset.cognates` - to which the cognate \
+        judgements of the wordlist, as yielded by `Wordlist.cognates`, are added, so forms \
+        are split only once.
+        """
         if concept_key is None:
             concept_key = lambda entry: entry.word_id
 
@@ -210,17 +299,15 @@ class Wordlist(object):
                 ds.sources.add(Source('misc', citekey, title=source))
 
             for entry in self.entries:
+                forms = list(util.split(entry.name))
+                if cognates is not None:
+                    cognates.extend(self._cognates(entry, forms))
                 if entry.name == '?':
                     continue
-                if not (citekey and source):
-                    src = entry.e.find('source')
-                    if src and getattr(src, 'text'):
-                        ref = slug(text_type(src.text))
-                        ds.sources.add(Source('misc', ref, title=src.text))
                 cid = concept_map.get(concept_key(entry))
                 if not cid:
                     unmapped.concepts.add((entry.word_id, entry.word))
-                for i, (form, context) in enumerate(util.split(entry.name)):
+                for i, (form, context) in enumerate(forms):
                     ds.add_row([
                         '{0}-{1}'.format(entry.id, i + 1),
                         self.language.glottocode,
@@ -242,19 +329,23 @@ class Wordlist(object):
             segmentize(ds)
         return ds
 
+    def _cognates(self, entry, forms):
+        for i, (form, context) in enumerate(forms):
+            for cognate_set_id, doubt in entry.cognates:
+                yield (
+                    '{0}-{1}'.format(entry.id, i + 1),
+                    self.id,
+                    form,
+                    cognate_set_id,
+                    doubt,
+                    'expert',
+                    '',
+                    '',
+                    '',
+                    '',
+                )
+
     def cognates(self):
         for entry in self.entries:
-            for i, (form, context) in enumerate(util.split(entry.name)):
-                for cognate_set_id, doubt in entry.cognates:
-                    yield (
-                        '{0}-{1}'.format(entry.id, i + 1),
-                        self.id,
-                        form,
-                        cognate_set_id,
-                        doubt,
-                        'expert',
-                        '',
-                        '',
-                        '',
-                        '',
-                    )
+            for cognate in self._cognates(entry, util.split(entry.name)):
+                yield cognate
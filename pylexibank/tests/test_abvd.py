@@ -0,0 +1,141 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+import logging
+import threading
+from unittest import TestCase
+
+from six.moves import BaseHTTPServer
+from six.moves.urllib.parse import urlparse, parse_qs
+from clldutils.path import TemporaryDirectory
+
+from pylexibank.providers import abvd
+from pylexibank.dataset import Unmapped
+from pylexibank.tests.test_dataset import make_dataset
+
+WORDLIST = '<record><id>{0}</id><language>Språk {0}</language></record>'
+XML = """\
+<record><id>12</id><language> Språk\x0b </language><silcode>abc</silcode></record>
+<record><id>1</id><word_id>007</word_id><word>hand</word><item>lima</item>
+<cognacy>1, 2?</cognacy><source>Source</source><loan>L</loan></record>
+<record><id>2</id><word_id>8</word_id><word>left</word><item></item></record>
+<record><id>3</id><word_id>10</word_id><word>two</word><item>rua</item><item>x</item></record>
+"""
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    A stand-in for the ABVD server, serving wordlists for the IDs in `server.languages`.
+    """
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append(self.path)
+        if url.path.endswith('language.php'):
+            if self.server.index:
+                self._send(''.join(
+                    '<a href="language.php?id={0}">{0}</a>'.format(i)
+                    for i in self.server.languages))
+            else:
+                self.send_error(404)
+            return
+        lid = int(parse_qs(url.query)['language'][0])
+        if lid in self.server.failures:
+            # Simulate a transient error:
+            self.server.failures.remove(lid)
+            if lid % 2:
+                self.send_error(503)
+            else:
+                self._send('')
+            return
+        self._send(WORDLIST.format(lid) if lid in self.server.languages else '')
+
+    def _send(self, content):
+        content = content.encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', '%s' % len(content))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class Dataset(object):
+    def __init__(self, raw):
+        self.raw = raw
+        self.log = logging.getLogger(__name__)
+
+
+class Tests(TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        self.server.languages = [1, 2, 4, 7]
+        self.server.failures, self.server.requests, self.server.index = [], [], True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        base = 'http://127.0.0.1:%s/' % self.server.server_port
+        self._urls = abvd.URL, abvd.INDEX_URL, abvd.MAX_LANGUAGE_ID
+        abvd.URL = base + 'save/?type=xml&section=%s&language=%d'
+        abvd.INDEX_URL = base + '%s/language.php'
+        abvd.MAX_LANGUAGE_ID = 10
+
+    def tearDown(self):
+        abvd.URL, abvd.INDEX_URL, abvd.MAX_LANGUAGE_ID = self._urls
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_Wordlist(self):
+        with TemporaryDirectory() as tmp:
+            path = tmp.joinpath('12.xml')
+            with path.open('w', encoding='utf8') as fp:
+                fp.write(XML)
+            wl = abvd.Wordlist(make_dataset(tmp, subsets=[]), path, 'bantu')
+            self.assertEqual(wl.id, 'bantu-12')
+            self.assertEqual((wl.language.name, wl.language.iso), ('Språk', 'abc'))
+            self.assertEqual([e.name for e in wl.entries], ['lima', 'rua'])
+            entry = wl.entries[0]
+            self.assertEqual(entry.word_id, '7')
+            self.assertEqual(entry.concept_id, 'bantu-7')
+            self.assertEqual(entry.cognates, {('7-1', False), ('7-2', True)})
+            self.assertIsNone(entry.comment)
+            self.assertFalse(hasattr(entry, '__dict__'))
+            self.assertIs(entry.cognates, entry.cognates)
+
+            # Cognate judgements can be collected while converting the wordlist:
+            cognates = []
+            cldf = wl.to_cldf({'7': '1'}, Unmapped(), cognates=cognates)
+            self.assertEqual([r['Value'] for r in cldf.rows], ['lima', 'rua'])
+            self.assertEqual(sorted(cognates), sorted(wl.cognates()))
+            self.assertEqual(len(cognates), 2)
+
+    def _download(self, raw):
+        return abvd.download(Dataset(raw), 'bantu', workers=3, backoff=0)
+
+    def test_download(self):
+        with TemporaryDirectory() as tmp:
+            # Downloads don't stop at gaps in the IDs and retry transient errors:
+            self.server.failures = [2, 7]
+            res = self._download(tmp)
+            self.assertEqual(res, {'ok': 4})
+            self.assertEqual(
+                sorted(p.name for p in tmp.iterdir()), ['1.xml', '2.xml', '4.xml', '7.xml'])
+            with tmp.joinpath('1.xml').open(encoding='utf8') as fp:
+                self.assertEqual(fp.read(), WORDLIST.format(1))
+            self.assertEqual(len(self.server.requests), 7)
+
+            # Existing files are skipped:
+            tmp.joinpath('4.xml').unlink()
+            self.assertEqual(self._download(tmp), {'skipped': 3, 'ok': 1})
+
+            # Errors are reported after all retries failed:
+            tmp.joinpath('4.xml').unlink()
+            self.server.failures = [4] * 4
+            self.assertEqual(self._download(tmp), {'skipped': 3, 'failed': 1})
+
+    def test_download_without_index(self):
+        with TemporaryDirectory() as tmp:
+            self.server.index = False
+            res = self._download(tmp)
+            self.assertEqual(res, {'ok': 4, 'missing': 5})
+            self.assertEqual(len(list(tmp.iterdir())), 4)
@@ -0,0 +1,53 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+from unittest import TestCase
+
+import os
+
+import bagit
+from clldutils.path import TemporaryDirectory
+
+from pylexibank import bag
+
+
+class Tests(TestCase):
+    def setUp(self):
+        self._dir = bag.cache.DIR
+
+    def tearDown(self):
+        bag.cache.DIR = self._dir
+
+    def test_is_valid(self):
+        with TemporaryDirectory() as tmp:
+            bag.cache.DIR = tmp.joinpath('cache')
+            bag_dir = tmp.joinpath('raw')
+            bag_dir.mkdir()
+            for i in range(5):
+                bag_dir.joinpath('%s.txt' % i).write_text('%s' % i)
+            b = bagit.make_bag(bag_dir.as_posix())
+
+            self.assertTrue(bag.is_valid(b))
+            self.assertTrue(bag.sidecar(b).exists())
+            self.assertTrue(bag.is_valid(b))
+
+            bag_dir.joinpath('data', '1.txt').write_text('x')
+            self.assertFalse(bag.is_valid(b))
+            self.assertFalse(bag.is_valid(b, paranoid=True))
+            bag.update_checksums(b)
+            self.assertTrue(bag.is_valid(b))
+            self.assertTrue(bag.is_valid(b, paranoid=True))
+
+            bag_dir.joinpath('data', '5.txt').write_text('5')
+            self.assertFalse(bag.is_valid(b))
+
+            # Edits of tag files are detected, even if the stat doesn't change:
+            bag.update_checksums(b)
+            self.assertTrue(bag.is_valid(b))
+            info = bag_dir.joinpath('bag-info.txt')
+            st = os.stat(info.as_posix())
+            info.write_text(info.read_text().replace('Bag-Software', 'Bag-Softwarx'))
+            if hasattr(st, 'st_mtime_ns'):
+                os.utime(info.as_posix(), ns=(st.st_atime_ns, st.st_mtime_ns))
+            else:  # pragma: no cover
+                os.utime(info.as_posix(), (st.st_atime, st.st_mtime))
+            self.assertFalse(bag.is_valid(bagit.Bag(bag_dir.as_posix())))
@@ -0,0 +1,39 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+import os
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+
+from pylexibank.catalog import Catalog, FNAME
+from pylexibank.tests.test_dataset import make_dataset, add_subset
+
+
+class Tests(TestCase):
+    def test_Catalog(self):
+        with TemporaryDirectory() as tmp:
+            ds = make_dataset(tmp)
+            self.assertTrue(tmp.joinpath(FNAME).exists())
+            catalog = Catalog.from_dataset(ds)
+            self.assertFalse(catalog.is_stale(ds))
+            records = catalog[ds]
+            self.assertEqual([r['name'] for r in records], [ds.id + '-a', ds.id + '-b'])
+            self.assertEqual(records[0]['lexeme_count'], 8)
+            self.assertEqual(records[0]['concepts'], [None])
+            self.assertEqual(records[0]['glottolog_count'], 0)
+
+            # Entries are recomputed from the CLDF data, when a metadata file changed:
+            md = ds.cldf_dir.joinpath(ds.id + '-a.csv-metadata.json')
+            os.utime(md.as_posix(), (0, 0))
+            self.assertTrue(catalog.is_stale(ds))
+            self.assertEqual(catalog[ds], records)
+            self.assertFalse(catalog.is_stale(ds))
+
+            add_subset(ds, 'c', ['a b'])
+            self.assertFalse(catalog.is_stale(ds))
+            self.assertEqual(catalog[ds][-1]['lexeme_count'], 1)
+
+            md.unlink()
+            self.assertTrue(catalog.is_stale(ds))
+            self.assertEqual(len(catalog[ds]), 2)
+            catalog.close()
@@ -0,0 +1,19 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+from unittest import TestCase
+
+from pyclpa.base import get_clpa
+
+from pylexibank.context import RunContext
+
+
+class Tests(TestCase):
+    def test_RunContext(self):
+        context = RunContext()
+        self.assertIsNone(context.glottolog_version)
+        self.assertIsNone(context.concepticon_version)
+        context.preload('glottolog_version')
+        self.assertIn('glottolog_version', context._cache)
+        context.preload('clpa')
+        self.assertIn('clpa', context._cache)
+        self.assertIs(context.clpa, get_clpa())
@@ -0,0 +1,57 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+import random
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+
+from pylexibank import cache, coverage
+from pylexibank.coverage import CoverageMatrix, cache_key
+
+
+class Tests(TestCase):
+    def setUp(self):
+        self._cache_dir = cache.DIR
+        self.cache = TemporaryDirectory()
+        cache.DIR = self.cache.__enter__()
+
+    def tearDown(self):
+        cache.DIR = self._cache_dir
+        self.cache.__exit__(None, None, None)
+
+    def test_CoverageMatrix(self):
+        rnd = random.Random(1)
+        varieties = {
+            'v%s' % i: set(c for c in range(1, 30) if rnd.random() < 0.8) for i in range(50)}
+        varieties['empty'] = set()
+        conceptlists = {
+            'l%s' % i: set(rnd.sample(range(1, 32), 10)) for i in range(20)}
+        conceptlists['small'] = {1, 2}
+
+        matrix = CoverageMatrix.from_sets(varieties)
+        self.assertEqual(len(matrix), 51)
+        self.assertEqual(matrix.bits.shape, (51, 4))
+        # Process the varieties in chunks:
+        self.addCleanup(setattr, coverage, 'CHUNK_SIZE', coverage.CHUNK_SIZE)
+        coverage.CHUNK_SIZE = 100
+        res = matrix.coverage(conceptlists)
+        self.assertEqual([r[0] for r in res], sorted(conceptlists))
+        for clid, full, partial in res:
+            concepts = conceptlists[clid]
+            self.assertEqual(
+                full, len([v for v in varieties.values() if concepts.issubset(v)]))
+            self.assertEqual(
+                partial,
+                len([v for v in varieties.values() if len(concepts & v) >= 9]
+                    if len(concepts) == 10 else
+                    [v for v in varieties.values() if concepts.issubset(v)]))
+        self.assertEqual(matrix.coverage({}), [])
+
+        key = cache_key(['csv', []])
+        self.assertIsNone(CoverageMatrix.from_cache(key))
+        matrix.to_cache(key)
+        cached = CoverageMatrix.from_cache(key)
+        self.assertEqual(cached.varieties, matrix.varieties)
+        self.assertEqual(cached.coverage(conceptlists), res)
+        cached.to_cache(cache_key(['csv', [1]]))
+        self.assertIsNone(CoverageMatrix.from_cache(key))
@@ -0,0 +1,222 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+import json
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+from clldutils import jsonlib
+
+from pylexibank import dataset, cache, lingpy_util
+from pylexibank.dataset import (
+    Dataset, DatasetInfo, CldfDataset, TranscriptionReport, Cognates, CognateIndex,
+)
+
+FORMS = ['ta ko', 'ˈma na', 'x ? y', 'pa  pa', 'tʰ o x', 'k a ʔ', 'a b c', '+ +']
+
+
+def make_dataset(d, subsets=('a', 'b'), forms=FORMS):
+    # The catalog is written to the parent directory of the dataset:
+    d = d.joinpath(d.name)
+    d.mkdir()
+    d.joinpath('raw').mkdir()
+    d.joinpath('__init__.py').write_text('')
+    jsonlib.dump({'dc:title': 'Test'}, d.joinpath('metadata.json'))
+    ds = Dataset(d)
+    for subset in subsets:
+        add_subset(ds, subset, forms)
+    return ds
+
+
+def add_subset(ds, subset, forms):
+    with CldfDataset(
+            ['ID', 'Language_ID', 'Language_name', 'Parameter_ID', 'Parameter_name',
+             'Value', 'Segments'],
+            ds,
+            subset=subset) as cldf:
+        for i, form in enumerate(forms):
+            cldf.add_row([
+                '%s-%s' % (subset, i),
+                '',
+                'lang%s%s' % (subset, i % 3),
+                '',
+                'concept%s' % i,
+                form.replace(' ', ''),
+                form])
+
+
+class Tests(TestCase):
+    def setUp(self):
+        self._chunk_size = dataset.REPORT_CHUNK_SIZE
+        self._cache_dir = cache.DIR
+        self.cache = TemporaryDirectory()
+        cache.DIR = self.cache.__enter__()
+
+    def tearDown(self):
+        dataset.REPORT_CHUNK_SIZE = self._chunk_size
+        lingpy_util.test_sequence_memo.close()
+        cache.DIR = self._cache_dir
+        self.cache.__exit__(None, None, None)
+
+    def test_DatasetInfo(self):
+        with TemporaryDirectory() as tmp:
+            tmp.joinpath('__init__.py').write_text('raise ValueError()')
+            tmp.joinpath('languages.csv').write_text('ID,GLOTTOCODE\nl,abcd1234\n')
+            jsonlib.dump(
+                {'dc:title': 'Test',
+                 'dc:conformsTo': 'http://concepticon.clld.org/contributions/Swadesh-1955-100'},
+                tmp.joinpath('metadata.json'))
+            ds = DatasetInfo(tmp)
+            self.assertEqual(ds.conceptlist, 'Swadesh-1955-100')
+            self.assertFalse(tmp.joinpath('raw').exists())
+            self.assertFalse(tmp.joinpath('cldf').exists())
+            self.assertEqual(list(ds.iter_cldf_metadata_paths()), [])
+            self.assertEqual(ds.concepts, [])
+            self.assertEqual(ds.languages[0]['GLOTTOCODE'], 'abcd1234')
+            with self.assertRaises(ValueError):
+                ds.commands
+
+            tmp.joinpath('__init__.py').write_text('')
+            ds = Dataset(tmp)
+            self.assertTrue(tmp.joinpath('raw', 'data').exists())
+            self.assertEqual(len(ds.languages), 1)
+
+    def test_TranscriptionReport_run(self):
+        def run(ds, **kw):
+            tr = TranscriptionReport(ds, ds.dir.joinpath('transcription.json'))
+            md = tr.run(column='Segments', segmentized=True, **kw)
+            return md, ds.dir.joinpath('transcription.json').read_text()
+
+        with TemporaryDirectory() as tmp:
+            ds = make_dataset(tmp)
+            md, report = run(ds)
+            self.assertIn('x <s> ? </s> y', md)
+            self.assertIn('langa0', jsonlib.load(ds.dir.joinpath('transcription.json')))
+            # The results for each CSV file are cached outside of the dataset:
+            self.assertNotIn('_files', jsonlib.load(ds.dir.joinpath('transcription.json')))
+            self.assertEqual(
+                len(list(cache.DIR.joinpath('transcription', ds.id).iterdir())), 1)
+
+            dataset.REPORT_CHUNK_SIZE = 3
+            tr = TranscriptionReport(ds, ds.dir.joinpath('transcription.json'))
+            self.assertEqual(
+                len(tr.chunks(list(ds.iter_cldf_metadata_paths()), processes=2)), 4)
+            self.assertEqual(run(ds, processes=2), (md, report))
+
+    def test_TranscriptionReport_memo(self):
+        memo = lingpy_util.test_sequence_memo
+        with TemporaryDirectory() as tmp:
+            ds = make_dataset(tmp)
+            dataset.REPORT_CHUNK_SIZE = 3
+            stats = memo.stats.copy()
+            TranscriptionReport(ds, ds.dir.joinpath('transcription.json')).run(
+                column='Segments', segmentized=True, processes=2)
+            # Items memoized and hits and misses counted by the workers are not lost:
+            self.assertGreater(memo.stats['misses'], stats['misses'])
+            self.assertGreater(memo.db.execute('SELECT count(*) FROM memo').fetchone()[0], 0)
+
+    def test_TranscriptionReport_stream(self):
+        with TemporaryDirectory() as tmp:
+            ds = make_dataset(tmp)
+            fname = ds.dir.joinpath('transcription.json')
+            md = TranscriptionReport(ds, fname).run(
+                column='Segments', segmentized=True, json_format='compact')
+            report = fname.read_text()
+
+            tr = TranscriptionReport(ds, fname)
+            res = tr.run(column='Segments', segmentized=True, stream=True)
+            self.assertEqual(fname.read_text(), report)
+            self.assertIn('* Bad words: 6', '%s' % tr)
+            streamed = ''.join(res)
+            self.assertEqual(streamed.split('## Words')[0], md.split('## Words')[0])
+            self.assertIn('| a-2 | langa2 | concept2 | x?y | x <s> ? </s> y |', streamed)
+            self.assertIn('(6 rows)', streamed)
+
+            TranscriptionReport(ds, fname).run(
+                column='Segments', segmentized=True, stream=True, json_format='gzip')
+            self.assertFalse(fname.exists())
+            self.assertEqual(TranscriptionReport(ds, fname).report, json.loads(report))
+
+    def test_TranscriptionReport_incremental(self):
+        analysed = []
+
+        def analyse_chunk(arg):
+            analysed.append(arg[1][0].name)
+            return _analyse_chunk(arg)
+
+        def run(ds, **kw):
+            tr = TranscriptionReport(ds, ds.dir.joinpath('transcription.json'))
+            md = tr.run(column='Segments', segmentized=True, **kw)
+            if kw.get('stream'):
+                md = ''.join(md)
+            return md, ds.dir.joinpath('transcription.json').read_text()
+
+        _analyse_chunk = dataset._analyse_chunk
+        dataset._analyse_chunk = analyse_chunk
+        try:
+            for kw in [{}, dict(stream=True)]:
+                with TemporaryDirectory() as tmp:
+                    ds = make_dataset(tmp, subsets=('a', 'b', 'c', 'd'))
+                    run(ds, **kw)
+                    self.assertEqual(len(analysed), 4)
+                    del analysed[:]
+                    self.assertEqual(run(ds, **kw)[1], run(ds, **kw)[1])
+                    self.assertEqual(analysed, [])
+
+                    add_subset(ds, 'b', FORMS[2:] + ['ʔ a ʔ', 'ʔ ?'])
+                    for p in ds.cldf_dir.glob('%s-c.csv*' % ds.id):
+                        p.unlink()
+                    incremental = run(ds, **kw)
+                    self.assertEqual(analysed, ['%s-b.csv-metadata.json' % ds.id])
+                    ds.dir.joinpath('transcription.json').unlink()
+                    self.assertEqual(incremental, run(ds, **kw))
+                    self.assertNotIn('langc0', incremental[1])
+                    del analysed[:]
+        finally:
+            dataset._analyse_chunk = _analyse_chunk
+
+    def test_Cognates(self):
+        rows = [
+            ['w%s' % (i % 7), 'wl%s' % (i % 3), 'form', 'c%s' % (i % 11), '', '', '',
+             ['a', 'b'] if i % 2 else 'a b', '', '']
+            for i in range(40)] + [['x', 'wl', 'form', 'single', '', '', '', '', '', '']]
+        with TemporaryDirectory() as tmp:
+            cognates = Cognates(max_size=6)
+            cognates.extend(rows[:20])
+            cognates += rows[20:]
+            self.assertEqual(len(cognates._runs), 6)
+            cognates.write(tmp)
+            res = cognates.read(tmp)
+            self.assertEqual(len(res), 40)
+            self.assertEqual(
+                [r['Word_ID'] for r in res],
+                [r[0] for r in sorted(rows[:40], key=lambda r: (r[3], r[1], r[0]))])
+            self.assertEqual(res[0]['Alignment'], 'a b')
+
+    def test_CognateIndex(self):
+        with TemporaryDirectory() as tmp:
+            index = CognateIndex(tmp)
+            self.assertEqual(index.stats, (0, 0))
+            cognates = Cognates()
+            cognates.extend([
+                ['w1', 'wl', 'a', 'c1', '', '', '', '', '', ''],
+                ['w2', 'wl', 'b', 'c1', '', '', '', '', '', ''],
+                ['w2', 'wl', 'b', 'c2', '', '', '', '', '', ''],
+                ['w3', 'wl', 'c', 'c2', '', '', '', '', '', ''],
+                ['w4', 'wl', 'd', 'c3', '', '', '', '', '', ''],
+            ])
+            cognates.write(tmp)
+            index = CognateIndex(tmp)
+            self.assertEqual(index.stats, (4, 2))
+            self.assertTrue(index.cache.exists())
+            self.assertEqual([r['Form'] for r in index.by_cognateset('c2')], ['b', 'c'])
+
+            index = CognateIndex(tmp)
+            self.assertEqual(len(index), 4)
+            self.assertIsNone(index._index)
+            self.assertEqual([r['Cognate_set_ID'] for r in index.by_word('w2')], ['c1', 'c2'])
+            self.assertEqual(index.cognatesets, ['c1', 'c2'])
+            self.assertEqual(len(list(index)), 4)
+
+            cognates.append(['w5', 'wl', 'e', 'c3', '', '', '', '', '', ''])
+            cognates.write(tmp)
+            self.assertEqual(CognateIndex(tmp).stats, (6, 3))
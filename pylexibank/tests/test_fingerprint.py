@@ -0,0 +1,56 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+
+from pylexibank import fingerprint, lingpy_util
+from pylexibank.fingerprint import Fingerprint
+
+
+class FakeDataset(object):
+    def __init__(self, d):
+        self.dir = d
+        self.raw = d.joinpath('raw', 'data')
+        self.raw.mkdir(parents=True)
+        self.cldf_dir = d.joinpath('cldf')
+        self.cldf_dir.mkdir()
+
+
+class Tests(TestCase):
+    def test_Fingerprint(self):
+        with TemporaryDirectory() as tmp:
+            ds = FakeDataset(tmp)
+            ds.raw.parent.joinpath('manifest-md5.txt').write_text('abc  data/x.txt\n')
+            ds.dir.joinpath('__init__.py').write_text('')
+            ds.dir.joinpath('util.py').write_text('')
+            self.assertIsNone(Fingerprint.load(ds))
+
+            fp = Fingerprint.from_dataset(ds, b'v1', 'v2')
+            self.assertEqual(fp['glottolog'], 'v1')
+            self.assertIsNone(fp['concepts.csv'])
+            fp.save(ds)
+            self.assertEqual(Fingerprint.load(ds), fp)
+            self.assertEqual(Fingerprint.from_dataset(ds, 'v1', 'v2').diff(fp), [])
+
+            ds.dir.joinpath('util.py').write_text('x = 1')
+            ds.dir.joinpath('concepts.csv').write_text('ID')
+            self.assertEqual(
+                Fingerprint.from_dataset(ds, 'v1', 'v3').diff(fp),
+                ['concepticon', 'concepts.csv', 'util.py'])
+
+    def test_Fingerprint_code(self):
+        with TemporaryDirectory() as tmp:
+            ds = FakeDataset(tmp)
+            fp = Fingerprint.from_dataset(ds, 'v1', 'v2')
+            self.assertEqual(fp['pylexibank'], fingerprint.package_checksum())
+            self.assertEqual(fp['lingpy'], lingpy_util.VERSIONS)
+
+            # Upgrading pylexibank or lingpy makes the fingerprint stale:
+            self.addCleanup(setattr, lingpy_util, 'VERSIONS', lingpy_util.VERSIONS)
+            self.addCleanup(
+                setattr, fingerprint, '_PACKAGE_CHECKSUM', fingerprint._PACKAGE_CHECKSUM)
+            fingerprint._PACKAGE_CHECKSUM = ['x']
+            lingpy_util.VERSIONS = 'lingpy-0.0'
+            self.assertEqual(
+                Fingerprint.from_dataset(ds, 'v1', 'v2').diff(fp), ['lingpy', 'pylexibank'])
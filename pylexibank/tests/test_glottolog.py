@@ -0,0 +1,47 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+
+from pylexibank.glottolog import GlottologIndex
+
+
+class Languoid(object):
+    def __init__(self, id, name, iso_code=None, macroareas=None, lineage=None):
+        self.id = id
+        self.name = name
+        self.iso_code = iso_code
+        self.macroareas = macroareas or []
+        self.lineage = [('', gc, '') for gc in lineage or []]
+
+
+class Tests(TestCase):
+    def test_GlottologIndex(self):
+        languoids = [
+            Languoid('stan1295', 'Standard German', 'deu', ['Eurasia'],
+                     ['indo1319', 'germ1287']),
+            Languoid('indo1319', 'Indo-European', macroareas=['Eurasia', 'Africa']),
+            Languoid('germ1287', 'Germanic', lineage=['indo1319']),
+            Languoid('abcd1234', 'Språk', 'abc'),
+        ]
+        with TemporaryDirectory() as tmp:
+            GlottologIndex.build(languoids, tmp, 'v1')
+            index = GlottologIndex(tmp)
+            self.assertEqual(index.version, 'v1')
+            self.assertEqual(len(index), 4)
+            self.assertEqual(index.ids, sorted(l.id for l in languoids))
+            self.assertEqual(index.iso2glottocode, {'deu': 'stan1295', 'abc': 'abcd1234'})
+            self.assertIn('germ1287', index)
+            self.assertNotIn('xxxx1234', index)
+            self.assertNotIn('', index)
+            self.assertEqual(index.iso('stan1295'), 'deu')
+            self.assertIsNone(index.iso('germ1287'))
+            self.assertEqual(index.name('abcd1234'), 'Språk')
+            self.assertEqual(index.macroareas('indo1319'), ['Africa', 'Eurasia'])
+            self.assertEqual(index.macroareas('germ1287'), [])
+            self.assertEqual(index.lineage('stan1295'), ['indo1319', 'germ1287'])
+            self.assertEqual(index.family('stan1295'), 'Indo-European')
+            self.assertEqual(index.family('abcd1234'), '')
+            with self.assertRaises(KeyError):
+                index.name('xxxx1234')
@@ -0,0 +1,70 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+from collections import defaultdict
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+
+from pylexibank.dataset import CldfDataset
+from pylexibank.lexemes import LexemeStore, FNAME
+from pylexibank.tests.test_dataset import make_dataset
+
+
+def add_wordlist(ds, subset, rows):
+    with CldfDataset(
+            ['ID', 'Language_ID', 'Language_name', 'Parameter_ID', 'Value', 'Segments'],
+            ds,
+            subset=subset) as cldf:
+        for row in rows:
+            cldf.add_row(row)
+
+
+class Tests(TestCase):
+    def test_LexemeStore(self):
+        with TemporaryDirectory() as tmp:
+            ds = make_dataset(tmp, subsets=[])
+            add_wordlist(ds, 'a', [
+                ['1', 'abcd1234', 'A', '1', 'ta', 't a'],
+                ['2', 'abcd1234', 'A', '1', 'tata', 't a t a'],
+                ['3', 'abcd1234', 'B', '2', 'pa', 'p a'],
+                ['4', '', 'C', '2', 'ko', 'k o'],
+                ['5', 'abcd1234', 'A', '', 'ka', 'k a'],
+            ])
+            ds.cognates.extend([
+                ['1', ds.id + '-a', 'ta', 'c1', '', '', '', '', '', ''],
+                ['2', ds.id + '-a', 'tata', 'c1', '', '', '', '', '', ''],
+            ])
+            ds.write_cognates()
+
+            store = LexemeStore.from_dataset(ds)
+            self.assertEqual(store.path, tmp.joinpath(FNAME))
+            self.assertEqual(store.update(ds), [ds.id + '-a.csv', 'cognates.csv'])
+            self.assertEqual(store.update(ds), [])
+            self.assertEqual(
+                [r[1] for r in store.files(ds.id)], sorted(['cognates.csv', ds.id + '-a.csv']))
+
+            coverage = defaultdict(set)
+            ds.coverage(coverage)
+            self.assertEqual(store.coverage(), dict(coverage))
+            self.assertEqual(store.coverage(), {'A': {1}, 'B': {2}, 'C': {2}})
+            self.assertEqual(
+                list(store.word_length(ds.id).items()), list(ds.word_length().items()))
+            self.assertEqual(
+                list(store.word_length().items())[0], ('1', ('abcd1234', 'A'), 2, 3.0, 't a'))
+            self.assertEqual(
+                store.cognatesets(), {(ds.id, 'c1'): [('A', 't a'), ('A', 't a t a')]})
+            self.assertEqual(store.coverage('x'), {})
+
+            # Only changed files are re-loaded, rows of removed files are deleted:
+            add_wordlist(ds, 'b', [['1', 'abcd1234', 'D', '3', 'ma', 'm a']])
+            self.assertEqual(store.update(ds), [ds.id + '-b.csv'])
+            self.assertEqual(store.coverage()['D'], {3})
+            for p in ds.cldf_dir.glob(ds.id + '-a.csv*'):
+                p.unlink()
+            self.assertEqual(store.update(ds), [ds.id + '-a.csv'])
+            self.assertEqual(store.coverage(), {'D': {3}})
+            self.assertEqual(store.cognatesets(), {})
+
+            store.prune(['x'])
+            self.assertEqual(store.coverage(), {})
+            store.close()
@@ -0,0 +1,298 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+import random
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory, rmtree
+
+from pylexibank import lingpy_util, cache
+
+
+class CldfDataset(object):
+    def __init__(self, name, forms):
+        self.name = name
+        self.rows = [dict(
+            ID='%s-%s' % (name, i),
+            Language_ID=lang,
+            Language_name=lang.upper(),
+            Parameter_ID=pid,
+            Parameter_name=concept,
+            Value=form.replace(' ', ''),
+            Segments=form,
+            Comment='') for i, (lang, pid, concept, form) in enumerate(forms)]
+
+
+class Tests(TestCase):
+    def setUp(self):
+        self._cache_dir = cache.DIR
+        self.cache = TemporaryDirectory()
+        cache.DIR = self.cache.__enter__()
+
+    def tearDown(self):
+        lingpy_util.alignment_memo.close()
+        cache.DIR = self._cache_dir
+        self.cache.__exit__(None, None, None)
+
+    def test_SegmentTable(self):
+        table = lingpy_util.SegmentTable(['a', 'ˈa', 'a', ''])
+        self.assertEqual(len(table), 2)
+        self.assertIn('ˈa', table)
+        rows = table.lookup(['ˈa', 't'])
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.stripped[rows[0]], 'a')
+        self.assertEqual(table.dolgo[rows[1]], 'T')
+        self.assertIsNone(table.lookup(['a', '']))
+
+    def test_test_sequence(self):
+        # Expected results recorded from the original implementation, which classified each
+        # token with `tokens2class` and `CLPA.check_sequence`:
+        for seq, kw, expected in [
+            (
+                'ˈta ko',
+                dict(segmentized=True),
+                [['ˈta', 'ko'], ['?', '?'], {}, {'ta': 1, 'ko': 1}, [], ['ko', 'ta'], {}, 1]),
+            (
+                'tʰoxtar',
+                dict(segmentized=False),
+                [
+                    ['tʰ', 'o', 'x', 't', 'a', 'r'],
+                    ['c136', 'v042', 'c772', 'c118', 'v130', 'c151'],
+                    {},
+                    {'tʰ': 1, 'o': 1, 'x': 1, 't': 1, 'a': 1, 'r': 1},
+                    [], [], {}, 0]),
+            (
+                'a  b',
+                dict(segmentized=True),
+                [[], [], {'a  b': 1}, {}, [], [], {}, 0]),
+            (
+                # A LingPy error:
+                'x ? y',
+                dict(segmentized=True),
+                [
+                    ['x', '?', 'y'], ['c772', '?', 'v166'], {}, {'x': 1, '?': 1, 'y': 1},
+                    ['?'], [], {}, 1]),
+            (
+                # A CLPA replacement:
+                'ˈʦ a',
+                dict(segmentized=True),
+                [['ˈʦ', 'a'], ['c015', 'v130'], {}, {'ʦ': 1, 'a': 1}, [], [], {'ʦ': ['ts']}, 0]),
+            (
+                # A CLPA error:
+                'č a',
+                dict(segmentized=True),
+                [['č', 'a'], ['?', 'v130'], {}, {'č': 1, 'a': 1}, [], ['č'], {}, 1]),
+        ]:
+            for res in [
+                lingpy_util._test_sequence(seq, table=lingpy_util.SegmentTable(), **kw),
+                lingpy_util._test_sequence(seq, **kw),
+                lingpy_util.test_sequence(seq, **kw),
+            ]:
+                self.assertEqual(
+                    [
+                        list(res[0]),
+                        list(res[1]),
+                        dict(res[2]),
+                        dict(res[3]),
+                        sorted(res[4]),
+                        sorted(res[5]),
+                        {k: sorted(v) for k, v in res[6].items()},
+                        res[7]],
+                    expected)
+        res = lingpy_util._test_sequence('a  b', segmentized=True)
+        self.assertEqual(res[2], {'a  b': 1})
+
+    def test_align(self):
+        forms = [
+            ('hand', ['a', 'b', 'c'], ['h a n d', 'h a n t', 'x a n d a']),
+            ('foot', ['a', 'b', 'c'], ['f u t', 'f uː s', 'p o d']),
+            ('water', ['a', 'b'], ['w a t ə r', 'w a s ə r']),
+            ('tree', ['a', 'c'], ['t r iː', 'd r u']),
+        ]
+
+        def alignments():
+            data = {0: ['doculect', 'concept', 'tokens', 'cogid']}
+            for cogid, (concept, languages, segments) in enumerate(forms):
+                for lang, seg in zip(languages, segments):
+                    data[len(data)] = [lang, concept, seg.split(), cogid + 1]
+            return lingpy_util.lp.Alignments(data, ref='cogid')
+
+        for method in ['library', 'progressive']:
+            serial, parallel = alignments(), alignments()
+            serial.align(method=method)
+            lingpy_util.align(parallel, method=method, processes=2)
+            self.assertEqual(
+                [serial[k, 'alignment'] for k in serial],
+                [parallel[k, 'alignment'] for k in parallel])
+            self.assertFalse(lingpy_util._ALIGN_WORKER)
+
+            # Now all alignments are retrieved from the cache:
+            stats = lingpy_util.alignment_memo.stats.copy()
+            cached = alignments()
+            lingpy_util.align(cached, method=method)
+            self.assertEqual(
+                [serial[k, 'alignment'] for k in serial],
+                [cached[k, 'alignment'] for k in cached])
+            self.assertEqual(
+                lingpy_util.alignment_memo.stats['hits'] - stats['hits'], len(forms))
+            self.assertEqual(lingpy_util.alignment_memo.stats['misses'], stats['misses'])
+
+        # For unknown lingpy versions, we fall back to `Alignments.align`:
+        self.addCleanup(setattr, lingpy_util.lp, '__version__', lingpy_util.lp.__version__)
+        lingpy_util.lp.__version__ = '99.0'
+        stats = lingpy_util.alignment_memo.stats.copy()
+        fallback = lingpy_util.align(alignments(), method=method, processes=2)
+        self.assertEqual(
+            [serial[k, 'alignment'] for k in serial],
+            [fallback[k, 'alignment'] for k in fallback])
+        self.assertEqual(lingpy_util.alignment_memo.stats, stats)
+
+    def test_get_scorer(self):
+        words = {
+            'hand': ['h a n d', 'h a n t', 'x a n d a'],
+            'foot': ['f u t', 'f uː s', 'p o d'],
+            'water': ['w a t ə r', 'w a s ə r', 'v a d a'],
+            'tree': ['t r iː', 'd r u', 't r e'],
+            'stone': ['s t oː n', 'ʃ t a i n', 's t e n'],
+        }
+
+        def lexstat():
+            data = {0: ['doculect', 'concept', 'ipa', 'tokens']}
+            for concept, forms in sorted(words.items()):
+                for lang, form in zip('abc', forms):
+                    data[len(data)] = [lang, concept, form.replace(' ', ''), form.split()]
+            return lingpy_util.lp.LexStat(data)
+
+        serial, parallel = lexstat(), lexstat()
+        lingpy_util.get_scorer(serial, runs=50)
+        cached = cache.DIR.joinpath('lexstat')
+        self.assertEqual(len(list(cached.iterdir())), 1)
+        rmtree(cached)
+        lingpy_util.get_scorer(parallel, processes=2, runs=50)
+        self.assertEqual(serial.cscorer.matrix, parallel.cscorer.matrix)
+        self.assertEqual(serial._randist, parallel._randist)
+        self.assertFalse(lingpy_util._LEXSTAT_WORKER)
+
+        # Now the scorer is retrieved from the cache:
+        lex = lexstat()
+        lingpy_util.get_scorer(lex, runs=50)
+        self.assertEqual(lex.cscorer.matrix, serial.cscorer.matrix)
+        self.assertEqual(lex._stamp, serial._stamp)
+        self.assertEqual(lex.params, serial.params)
+        for l in [lex, serial]:
+            l.cluster(method='lexstat', threshold=0.6, ref='lexstatid')
+        self.assertEqual(
+            [lex[k, 'lexstatid'] for k in lex], [serial[k, 'lexstatid'] for k in serial])
+
+        # Parameters and scores are computed like lingpy does:
+        lex = lexstat()
+        lex.get_scorer(runs=50)
+        kw = lex.get_scorer(defaults=True, runs=50)
+        self.assertEqual(lex.params['cscorer'], lingpy_util._scorer_params(kw)[0])
+        self.assertEqual(
+            lex.cscorer.matrix,
+            lingpy_util._scorer_matrix(lex, lex._corrdist, lex._randist, kw))
+
+        # Random words for the markov method are generated without touching the state of
+        # the global random number generator:
+        state = random.getstate()
+        serial, parallel = lexstat(), lexstat()
+        kw = dict(method='markov', runs=50, rands=20, limit=100)
+        lingpy_util.get_scorer(serial, **kw)
+        rmtree(cached)
+        lingpy_util.get_scorer(parallel, processes=2, **kw)
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(serial.cscorer.matrix, parallel.cscorer.matrix)
+
+        # For unknown lingpy versions, we fall back to `LexStat.get_scorer`, still caching
+        # the scorer:
+        self.addCleanup(setattr, lingpy_util.lp, '__version__', lingpy_util.lp.__version__)
+        lingpy_util.lp.__version__ = '99.0'
+        fallback, lex = lexstat(), lexstat()
+        lingpy_util.get_scorer(fallback, runs=50)
+        lingpy_util.get_scorer(lex, runs=50)
+        self.assertEqual(lex.cscorer.matrix, fallback.cscorer.matrix)
+        self.assertEqual(lex._stamp, fallback._stamp)
+        self.assertEqual(lex.params, fallback.params)
+
+        # Only the most recently used scorers are kept:
+        self.assertEqual(len(list(cached.iterdir())), 2)
+        lingpy_util._prune_lexstat_cache(cached, size=1)
+        self.assertEqual(len(list(cached.iterdir())), 1)
+
+    def test_iter_partitioned_cognates(self):
+        datasets = [
+            CldfDataset('a', [
+                ('l1', '1', 'hand', 'h a n d'),
+                ('l2', '1', 'hand', 'h a n t'),
+                ('l1', '2', 'foot', 'f u t'),
+                ('l2', '2', 'foot', 'm o k u')]),
+            CldfDataset('b', [
+                ('l1', '1', 'hand', 'x a n d a'),
+                ('l1', '2', 'foot', 'f u s'),
+                ('l2', '3', 'tree', 't r iː')]),
+        ]
+
+        class Dataset(object):
+            def iter_cldf_datasets(self):
+                return iter(datasets)
+
+        with self.assertRaises(ValueError):
+            list(lingpy_util.iter_partitioned_cognates(datasets, method='lexstat'))
+
+        res = list(lingpy_util.iter_cognates(
+            Dataset(), method='sca', threshold=0.45, partitioned=True))
+        self.assertEqual(
+            res,
+            list(lingpy_util.iter_partitioned_cognates(
+                datasets, method='sca', threshold=0.45, processes=2)))
+        self.assertFalse(lingpy_util._PARTITION_WORKER)
+        cogids = {r[0]: r[3] for r in res}
+        self.assertEqual(len(cogids), 7)
+        self.assertEqual(cogids['a-0'], cogids['b-0'])
+        self.assertEqual(cogids['a-2'], cogids['b-1'])
+        self.assertNotEqual(cogids['a-2'], cogids['a-3'])
+        self.assertEqual(len(set(cogids.values())), 4)
+        self.assertEqual(res[0][1], 'a')
+
+        def partition(rows):
+            sets = {}
+            for row in rows:
+                sets.setdefault(row[3], set()).add(row[0])
+            return sorted(sorted(ids) for ids in sets.values())
+
+        # Clustering all words at once yields the same cognate sets:
+        for ds in datasets:
+            for row in ds.rows:
+                row['Segments'] = row['Segments'].split()
+        self.assertEqual(
+            partition(res),
+            partition(lingpy_util.iter_cognates(datasets, method='sca', threshold=0.45)))
+
+        # Words with empty segments are skipped:
+        datasets.append(CldfDataset('c', [('l3', '1', 'hand', '')]))
+        self.assertEqual(
+            list(lingpy_util.iter_partitioned_cognates(
+                datasets, method='sca', threshold=0.45)),
+            res)
+
+    def test_cldf2wld(self):
+        datasets = [
+            CldfDataset('a', [('l1', '1', 'hand', 'h a n d'), ('l2', '1', 'hand', 'h a n t')]),
+            CldfDataset('b', [('l1', '1', 'hand', 'x a n d a')]),
+        ]
+        datasets[1].rows[0]['Parameter_name'] = ''.join(['ha', 'nd'])
+        wld = lingpy_util._cldf2wld(datasets)
+        self.assertEqual(len(wld), 4)
+        self.assertEqual(
+            wld[0],
+            ['lid', 'language_name', 'parameter_name', 'value', 'segments', 'cldf_dataset'])
+        self.assertEqual(wld[3], ['b-0', 'L1', 'hand', 'xanda', 'x a n d a', 'b'])
+        self.assertIs(wld[1][2], wld[3][2])
+        self.assertIs(wld[1][3], datasets[0].rows[0]['Value'])
+
+        cognates = [
+            [r['ID'], ds.name, r['Value'], '1', '', '', '', '', '', '']
+            for ds in datasets for r in ds.rows]
+        alignments = list(lingpy_util.iter_alignments(datasets, cognates))
+        self.assertEqual([r[0] for r in alignments], ['a-0', 'a-1', 'b-0'])
+        self.assertEqual(alignments[0][7], 'h a n d -')
@@ -0,0 +1,34 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+from unittest import TestCase
+
+from clldutils.path import TemporaryDirectory
+
+from pylexibank import memo
+
+
+class Tests(TestCase):
+    def tearDown(self):
+        for name in ['t1', 't2']:
+            memo.MEMOS.pop(name, None)
+
+    def test_Memo(self):
+        with TemporaryDirectory() as tmp:
+            m = memo.Memo('t1', maxsize=1, path=tmp.joinpath('memo.sqlite'))
+            with self.assertRaises(KeyError):
+                m['a']
+            m['a'] = [1, {'x': 'y'}]
+            m['b'] = 2
+            self.assertEqual(m['b'], 2)
+            self.assertEqual(m.stats, {'hits': 1, 'misses': 1})
+            m.flush()
+
+            m = memo.Memo('t2', path=tmp.joinpath('memo.sqlite'))
+            self.assertEqual(m['a'], [1, {'x': 'y'}])
+            self.assertEqual(m['a'], [1, {'x': 'y'}])
+            self.assertEqual(memo.stats()['t2'], {'hits': 2, 'misses': 0})
+            m.close()
+            stats = memo.stats()
+            self.assertEqual(
+                memo.format_stats({k: stats[k] for k in ['t1', 't2']}),
+                't1 cache: 1 hits, 1 misses; t2 cache: 2 hits, 0 misses')
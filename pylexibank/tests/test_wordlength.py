@@ -0,0 +1,40 @@
+# coding: utf8
+from __future__ import unicode_literals, print_function, division
+import pickle
+from unittest import TestCase
+
+from pylexibank.wordlength import WordLengths
+
+ROWS = [
+    ('1', 'abcd1234', 'A', 't a'),
+    ('2', 'abcd1234', 'A', 'p a t a'),
+    ('1', 'abcd1234', 'B', 'k o'),
+    ('1', 'abcd1234', 'A', 't a t a'),
+    ('1', 'efgh1234', 'C', 'm'),
+]
+
+
+class Tests(TestCase):
+    def test_WordLengths(self):
+        wl = WordLengths().add(ROWS)
+        self.assertEqual(len(wl), 4)
+        self.assertEqual(list(wl.items())[0], ('1', ('abcd1234', 'A'), 2, 3.0, 't a'))
+        self.assertEqual(list(wl.items(raw=True))[0], ('1', ('abcd1234', 'A'), 2, 6, 't a'))
+        self.assertEqual(wl.language_counts().tolist(), [3, 1])
+        self.assertEqual(
+            [(r[0], r[1][1]) for r in wl.iter_rows(min_languages=1)],
+            [('1', 'A'), ('1', 'B'), ('1', 'C'), ('2', 'A')])
+        self.assertEqual([r[1][1] for r in wl.iter_rows(min_languages=2)], ['A', 'B', 'C'])
+        self.assertEqual(list(wl.iter_rows()), [])
+
+        # Aggregates of parts of the data - e.g. computed in worker processes - can be
+        # merged, and merging in order keeps the first forms:
+        merged = WordLengths()
+        for i in range(0, len(ROWS), 2):
+            merged.merge(pickle.loads(pickle.dumps(WordLengths().add(ROWS[i:i + 2]))))
+        self.assertEqual(list(merged.items()), list(wl.items()))
+
+        # Arrays grow as needed:
+        wl.add(('c%s' % i, 'abcd1234', 'A', 'a') for i in range(3000))
+        self.assertEqual(len(wl), 3004)
+        self.assertEqual(wl.language_counts().sum(), 3004)
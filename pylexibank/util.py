@@ -1,11 +1,16 @@
 # coding=utf8
 from __future__ import unicode_literals
+import os
+import time
 import logging
 import re
 import zipfile
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from collections import Counter
 
+from six import binary_type
 from six.moves.urllib.request import urlretrieve
-import xlrd
 from clldutils.dsv import reader, UnicodeWriter
 from clldutils.path import Path, as_posix, copy, TemporaryDirectory
 from clldutils.misc import slug
@@ -18,6 +23,27 @@ REPOS_PATH = Path(pylexibank.__file__).parent.parent
 YEAR_PATTERN = re.compile('\s+\(?(?P<year>[1-9][0-9]{3}(-[0-9]+)?)(\)|\.)')
 
 
+def text(s):
+    """
+    Make sure we deal with unicode strings, e.g. for output of subprocesses.
+    """
+    if isinstance(s, binary_type):
+        return s.decode('utf8')
+    return s
+
+
+def pool(processes):
+    """
+    :return: A `multiprocessing.Pool` of forked worker processes - which thus inherit \
+    module-level state of the parent process.
+    """
+    try:
+        return multiprocessing.get_context('fork').Pool(processes)
+    except AttributeError:  # pragma: no cover
+        # Python 2.7 has no contexts, but forks on posix systems anyway.
+        return multiprocessing.Pool(processes)
+
+
 def clean_form(form):
     form = form.replace('(?)', '').strip()
     if form.startswith('['):
@@ -66,6 +92,8 @@ def split(s, sep=',;', exclude_contexts=None):
 
 
 def xls2csv(fname, outdir=None):
+    import xlrd
+
     res = {}
     outdir = outdir or fname.parent
     wb = xlrd.open_workbook(as_posix(fname))
@@ -123,3 +151,104 @@ def download_and_unpack_zipfiles(url, dataset, *paths):
             for path in paths:
                 zipf.extract(as_posix(path), path=tmpdir.as_posix())
                 copy(tmpdir.joinpath(path), dataset.raw)
+
+
+class Downloader(object):
+    """
+    Concurrent download of many URLs to files, e.g. of the wordlists of a database.
+
+    Requests are sent from a pool of `workers` threads sharing the connection pool of one
+    `requests.Session`. Requests failing with connection errors, timeouts or server errors
+    are retried `retries` times, waiting `backoff * 2 ** i` seconds before the i-th retry.
+    Files are written atomically, so a download can be resumed by simply running it again:
+    Targets which exist already are skipped.
+    """
+    RETRY_STATUS = [429, 500, 502, 503, 504]
+
+    def __init__(self, workers=8, retries=3, backoff=1.0, timeout=60, log=None):
+        import requests
+
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.log = log or logging.getLogger(pylexibank.__name__)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, required=True):
+        """
+        :param required: Flag signaling whether an empty response should be retried - or \
+        just means there is no data at this URL.
+        :return: `requests.Response` or `None` if there is no data at `url`.
+        """
+        import requests
+
+        for i in range(self.retries + 1):
+            if i:
+                time.sleep(self.backoff * 2 ** (i - 1))
+            try:
+                res = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                continue
+            if res.status_code in self.RETRY_STATUS:
+                error = 'HTTP status %s' % res.status_code
+                continue
+            if res.status_code == 404:
+                return None
+            res.raise_for_status()
+            if res.content:
+                return res
+            if not required:
+                return None
+            error = 'empty response'
+        raise ValueError('%s failed: %s' % (url, error))
+
+    def fetch(self, target, required=True, decode=False):
+        """
+        :param target: Pair (URL, path).
+        :param decode: Flag signaling whether to write the decoded text of the response \
+        UTF-8 encoded rather than the raw content.
+        :return: Pair (path, status), where status is one of `ok`, `missing` or `failed`.
+        """
+        url, path = target
+        try:
+            res = self.get(url, required=required)
+        except Exception as e:
+            self.log.warn('%s' % e)
+            return path, 'failed'
+        if res is None:
+            return path, 'missing'
+        tmp = path.parent.joinpath('.' + path.name + '.download')
+        with tmp.open('wb') as fp:
+            fp.write(res.text.encode('utf8') if decode else res.content)
+        os.rename(tmp.as_posix(), path.as_posix())
+        return path, 'ok'
+
+    def download(self, targets, required=True, decode=False):
+        """
+        :param targets: Iterable of pairs (URL, path).
+        :param required: Flag signaling whether an empty response is an error, see `get`.
+        :return: `Counter` of the status of the targets, including `skipped` for targets \
+        which exist already.
+        """
+        res, todo = Counter(), []
+        for url, path in targets:
+            if path.exists():
+                res.update(['skipped'])
+            else:
+                todo.append((url, path))
+        if todo:
+            pool = ThreadPool(min(self.workers, len(todo)))
+            try:
+                for _, status in pool.imap_unordered(
+                        lambda t: self.fetch(t, required=required, decode=decode), todo):
+                    res.update([status])
+            finally:
+                pool.close()
+                pool.join()
+        return res
@@ -0,0 +1,141 @@
+# coding: utf8
+"""
+Streaming aggregation of word lengths across lexibank datasets.
+
+Rather than collecting all forms, we keep a running count, a sum of the number of segments
+and the first form for each pair (concept, language variety). Concepts and varieties are
+interned as integer indices and the aggregates are stored in NumPy arrays, so adding a
+batch of forms - or merging the aggregates of another dataset, e.g. computed in a worker
+process - boils down to a few vectorized operations.
+"""
+from __future__ import unicode_literals, print_function, division
+
+import numpy as np
+
+COLUMNS = [
+    'Concepticon_ID',
+    'Gloss',
+    'Semanticfield',
+    'Category',
+    'Glottocode',
+    'Variety',
+    'Family',
+    'Form',
+    'Length',
+]
+# Columns which may be requested in addition to the default ones:
+EXTRA_COLUMNS = ['Count']
+# Minimal number of varieties with forms for a concept to be included in the output:
+MIN_LANGUAGES = 500
+
+
+class WordLengths(object):
+    def __init__(self):
+        self.concepts, self.languages = [], []
+        self._concepts, self._languages, self._keys = {}, {}, {}
+        self.keys = []  # Pairs (concept index, language index) of the aggregates.
+        self.concept = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0, dtype=np.int64)
+        self.forms = []
+
+    def __len__(self):
+        return len(self.forms)
+
+    def _key(self, pid, language):
+        """
+        :return: Pair (index of the aggregate, index of the concept) for a concept and a \
+        (Glottocode, variety) pair.
+        """
+        c = self._concepts.get(pid)
+        if c is None:
+            c = self._concepts[pid] = len(self.concepts)
+            self.concepts.append(pid)
+        l = self._languages.get(language)
+        if l is None:
+            l = self._languages[language] = len(self.languages)
+            self.languages.append(language)
+        i = self._keys.get((c, l))
+        if i is None:
+            i = self._keys[(c, l)] = len(self.keys)
+            self.keys.append((c, l))
+        return i, c
+
+    def _resize(self, n):
+        if n > len(self.counts):
+            size = max(n, 2 * len(self.counts), 1024)
+            for attr in ['concept', 'counts', 'sums']:
+                array = getattr(self, attr)
+                setattr(self, attr, np.concatenate(
+                    [array, np.zeros(size - len(array), dtype=array.dtype)]))
+
+    def _add(self, items):
+        """
+        :param items: Iterable of tuples (concept, language, count, sum, first form).
+        """
+        start, indices, counts, sums, concepts = len(self), [], [], [], []
+        for pid, language, count, sum_, form in items:
+            i, c = self._key(pid, language)
+            if i == len(self.forms):
+                self.forms.append(form)
+                concepts.append(c)
+            indices.append(i)
+            counts.append(count)
+            sums.append(sum_)
+        self._resize(len(self))
+        self.concept[start:len(self)] = concepts
+        indices = np.array(indices, dtype=np.int64)
+        np.add.at(self.counts, indices, np.array(counts, dtype=np.int64))
+        np.add.at(self.sums, indices, np.array(sums, dtype=np.int64))
+
+    def add(self, rows):
+        """
+        :param rows: Iterable of tuples (Concepticon ID, Glottocode, variety ID, segments).
+        """
+        self._add(
+            (pid, (lid, variety), 1, len(segments.split()), segments)
+            for pid, lid, variety, segments in rows)
+        return self
+
+    def merge(self, other):
+        """
+        Merge the aggregates of another `WordLengths` instance, keeping the first forms of
+        `self` for pairs known to both.
+        """
+        self._add(other.items(raw=True))
+        return self
+
+    def items(self, raw=False):
+        """
+        :return: Generator of tuples (Concepticon ID, (Glottocode, variety ID), count, \
+        sum of segment counts - or average number of segments, first form).
+        """
+        for i, (c, l) in enumerate(self.keys):
+            yield self._item(i, c, l, raw=raw)
+
+    def _item(self, i, c, l, raw=False):
+        count, sum_ = int(self.counts[i]), int(self.sums[i])
+        return (
+            self.concepts[c],
+            self.languages[l],
+            count,
+            sum_ if raw else sum_ / count,
+            self.forms[i])
+
+    def language_counts(self):
+        """
+        :return: Array with the number of varieties per concept, indexed like `concepts`.
+        """
+        return np.bincount(self.concept[:len(self)], minlength=len(self.concepts))
+
+    def iter_rows(self, min_languages=MIN_LANGUAGES):
+        """
+        :param min_languages: Minimal number of varieties with forms for a concept.
+        :return: Generator of tuples as yielded by `items`, grouped by concept.
+        """
+        n = len(self)
+        selected = self.language_counts()[self.concept[:n]] >= min_languages
+        # A stable sort keeps the order in which pairs were added within each concept:
+        for i in np.argsort(self.concept[:n], kind='mergesort'):
+            if selected[i]:
+                yield self._item(i, *self.keys[i])
@@ -14,10 +14,11 @@ requires = [
     'pyglottolog',
     'pyconcepticon>=0.4',
     'lingpy',
+    'numpy',
     'pyclpa>=0.3.1',
     'tabulate',
     'tqdm',
-    'bagit>=1.5.4',
+    'bagit>=1.6.0',
 ]
 
 setup(